@@ -0,0 +1,169 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, up to ``burst`` banked"""
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+
+    def take(self, rate: float, burst: float, now: float, count: int = 1) -> int:
+        """Take up to ``count`` tokens, return how many were granted"""
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        granted = min(count, int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+    def wait_for(self, rate: float, count: int = 1) -> float:
+        """Seconds until ``count`` tokens are available"""
+        missing = count - self.tokens
+        return max(0.0, missing / rate) if rate > 0 else math.inf
+
+
+class AdmissionController:
+    """Latency-SLO admission control plus per-client fairness.
+
+    Keeps moving estimates (EWMA) of queue wait, processing time and drain rate
+    (completions per second). A new request is predicted to finish after
+    ``queued / drain_rate + processing_time``; if that exceeds the SLO it is
+    rejected with a Retry-After hint instead of waiting hours in the queue.
+    """
+
+    def __init__(self, slo_seconds: float, client_rate: float, client_burst: float,
+                 window_seconds: float = 1.0, alpha: float = 0.3, max_clients: int = 10000):
+        self.slo_seconds = slo_seconds
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.window_seconds = window_seconds
+        self.alpha = alpha
+        self.max_clients = max_clients
+
+        # Moving estimates (None until the first sample)
+        self.drain_rate: Optional[float] = None
+        self.processing_time: Optional[float] = None
+        self.queue_wait: Optional[float] = None
+
+        self._window_start = time.monotonic()
+        self._window_completions = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+        # Counters
+        self.admitted = 0
+        self.rejected_slo = 0
+        self.rejected_rate_limit = 0
+
+    # ------------------------------------------------------------------
+    # Observations
+    # ------------------------------------------------------------------
+    def _ewma(self, current: Optional[float], sample: float) -> float:
+        return sample if current is None else self.alpha * sample + (1 - self.alpha) * current
+
+    def record_dequeue(self, wait_seconds: float):
+        self.queue_wait = self._ewma(self.queue_wait, wait_seconds)
+
+    def record_completion(self, processing_seconds: Optional[float]):
+        if processing_seconds is not None:
+            self.processing_time = self._ewma(self.processing_time, processing_seconds)
+        self._window_completions += 1
+        self._roll(time.monotonic(), backlog=True)
+
+    def _roll(self, now: float, backlog: bool):
+        """Close the drain-rate window once it has elapsed.
+
+        Idle windows (nothing queued, nothing completed) are skipped so that a
+        quiet period doesn't read as a slow system.
+        """
+        elapsed = now - self._window_start
+        if elapsed < self.window_seconds:
+            return
+        if self._window_completions or backlog:
+            self.drain_rate = self._ewma(self.drain_rate, self._window_completions / elapsed)
+        self._window_start = now
+        self._window_completions = 0
+
+    # ------------------------------------------------------------------
+    # Decisions
+    # ------------------------------------------------------------------
+    def predicted_completion(self, queued: int) -> Optional[float]:
+        """Predicted seconds until a request admitted now would finish (None = no data yet)"""
+        if self.processing_time is None:
+            return None
+        if queued <= 0:
+            return self.processing_time
+        if not self.drain_rate:
+            return math.inf
+        return queued / self.drain_rate + self.processing_time
+
+    def slo_headroom(self, queued: int) -> Optional[int]:
+        """How many more requests fit under the SLO right now (None = unlimited / no data)"""
+        self._roll(time.monotonic(), backlog=queued > 0)
+        if self.processing_time is None or self.drain_rate is None:
+            return None
+        budget = (self.slo_seconds - self.processing_time) * self.drain_rate
+        return max(0, int(budget) - queued)
+
+    def retry_after(self, queued: int) -> int:
+        """Seconds until the backlog should have drained back under the SLO"""
+        predicted = self.predicted_completion(queued)
+        if predicted is None:
+            return 1
+        if math.isinf(predicted):
+            return max(1, int(self.slo_seconds))
+        return max(1, math.ceil(predicted - self.slo_seconds))
+
+    def take_tokens(self, client_key: str, count: int = 1) -> Tuple[int, float]:
+        """Charge a client for ``count`` requests; returns (granted, seconds until the rest would be granted)"""
+        now = time.monotonic()
+        bucket = self._buckets.get(client_key)
+        if bucket is None:
+            bucket = TokenBucket(self.client_burst, now)
+            self._buckets[client_key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_key)
+        granted = bucket.take(self.client_rate, self.client_burst, now, count)
+        wait = bucket.wait_for(self.client_rate, count - granted) if granted < count else 0.0
+        return granted, wait
+
+    def admit(self, client_key: str, queued: int) -> Tuple[bool, int, int, str]:
+        """Decide on a single request: (admitted, status_code, retry_after_seconds, reason)"""
+        granted, wait = self.take_tokens(client_key)
+        if not granted:
+            self.rejected_rate_limit += 1
+            return False, 429, max(1, math.ceil(wait)), f"Client {client_key} exceeded {self.client_rate}/s"
+
+        headroom = self.slo_headroom(queued)
+        if headroom is not None and headroom <= 0:
+            self.rejected_slo += 1
+            predicted = self.predicted_completion(queued)
+            return False, 503, self.retry_after(queued), (
+                f"Predicted completion {predicted:.1f}s exceeds SLO {self.slo_seconds}s"
+            )
+
+        self.admitted += 1
+        return True, 200, 0, "admitted"
+
+    def stats(self, queued: int) -> Dict:
+        predicted = self.predicted_completion(queued)
+        return {
+            "slo_seconds": self.slo_seconds,
+            "drain_rate_per_second": self.drain_rate,
+            "avg_processing_time": self.processing_time,
+            "avg_queue_wait": self.queue_wait,
+            "predicted_completion_seconds": None if predicted is None or math.isinf(predicted) else predicted,
+            "slo_headroom": self.slo_headroom(queued),
+            "client_rate_per_second": self.client_rate,
+            "client_burst": self.client_burst,
+            "tracked_clients": len(self._buckets),
+            "admitted": self.admitted,
+            "rejected_slo": self.rejected_slo,
+            "rejected_rate_limit": self.rejected_rate_limit,
+        }
@@ -1,34 +1,197 @@
 import asyncio
-from fastapi import FastAPI, BackgroundTasks, HTTPException
-from typing import Dict
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from typing import Dict, Optional
 import time
+import math
+import os
 import uuid
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
-import threading
 import sqlite3
 import json
 from contextlib import asynccontextmanager
+from tracker import RequestTracker
+from scheduler import WorkerScheduler
+from fair_queue import FairQueue, TenantStats, parse_priority, PRIORITY_NORMAL, DEFAULT_TENANT
+from result_store import ResultStore
+from result_stream import ResultHub
+from admission import AdmissionController
+from metrics import MetricsRegistry
+from event_log import EventLogger, DEBUG, INFO, WARNING, ERROR
+from broker import connect as connect_broker, BROKER_ADDRESS
+from stages import fun_1, fun_2, fun_3, fun_1_async, fun_2_async, fun_3_async
+from executors import ThreadBackend, ProcessBackend, AsyncioBackend, BACKEND_THREAD, BACKEND_PROCESS, BACKEND_ASYNCIO
+import rollups
+import retention
+import queue_metrics
+from pipeline_dag import Stage, PipelineDAG, DeadlineExceeded
+from resilience import RetryPolicy, RetryBudget, CircuitBreaker, CircuitOpenError, BREAKER_CLOSED
+from memo import MemoCache, SOURCE_COMPUTED
+from elastic_pool import ElasticThreadPool, PoolAutoscaler
+from tracing import Tracer, chrome_trace
+from profiler import SamplingProfiler, ProfileBusy, collapsed
+from schemas import ProcessRequest, ProcessResponse, ACK_FULL, ACK_MINIMAL, ACK_MODES, openapi_body, json_response
 
 # Database configuration
 DATABASE_PATH = "requests_tracker.db"
 MAX_QUEUE_SIZE = 100000  # Limit each queue to 100K requests
+MAX_BATCH_SIZE = 10000  # Max items accepted by one /process/batch call
+# /process response: "full" (assignment, queue depth, timestamp) or "minimal" ({"status", "request_id"});
+# clients can pick per call with ?ack=
+PROCESS_ACK = ACK_FULL
+
+# Admission control
+LATENCY_SLO_SECONDS = 60  # Reject when a new request is predicted to finish later than this
+CLIENT_RATE_PER_SECOND = 500  # Sustained submissions per client (X-Client-Id header or IP)
+CLIENT_BURST = 2000  # Submissions a client may burst above its rate
+DB_BATCH_SIZE = 1000  # Max records per group commit
+DB_FLUSH_INTERVAL = 0.05  # Max seconds a record waits before being committed
+# Durable mode: /process only acknowledges once the request row is committed, and
+# requests left 'queued'/'processing' by a crash are replayed into the queues on startup
+DURABLE_QUEUE = False
+# Graceful shutdown: stop admission, give in-flight requests this long to finish, leave the rest
+# 'queued'/'processing' in the DB and replay them on the next start (RESUME_UNFINISHED)
+SHUTDOWN_DRAIN_SECONDS = 10
+RESUME_UNFINISHED = True
+
+# Scale-out mode: run `python broker.py --executors N` first, then `uvicorn app:app --workers M`.
+# API processes submit to the broker's shared job queue; the broker's executor
+# processes run the pipeline. /status and /queue-status read the shared index.
+SCALE_OUT_MODE = False
 
 app = FastAPI()
-MAX_WORKERS = 4
+# Worker queues (and thread pools); set MAX_WORKERS in the environment to size for the box.
+# Hash routing is consistent, so changing it only moves about 1/N of the request ids
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", 4))
+# Priority classes ("high" > "normal" > "low") and deficit round robin between tenants inside a class
+TENANT_WEIGHTS = {}  # tenant -> share of its class per round (default 1), e.g. {"interactive": 4}
+tenant_stats = TenantStats()
+
+def classify_request(data: Dict):
+    return data.get("_priority", PRIORITY_NORMAL), data.get("_tenant", DEFAULT_TENANT)
+
 # Create separate queues for each worker to avoid contention
-worker_queues = [asyncio.Queue(maxsize=MAX_QUEUE_SIZE) for _ in range(MAX_WORKERS)]
+worker_queues = [
+    FairQueue(maxsize=MAX_QUEUE_SIZE, classify=classify_request, weights=TENANT_WEIGHTS, tenant_stats=tenant_stats)
+    for _ in range(MAX_WORKERS)
+]
 
 THREADS_PER_WORKER = 1000
 MAX_CONCURRENT_REQUESTS = MAX_WORKERS * THREADS_PER_WORKER
 
-# Store processed results
-processed_results = {}
+# "hash" keeps a request id pinned to one queue, "least_loaded" picks the shortest queue
+ROUTING_STRATEGY = "hash"
+# Event-driven dispatch with work stealing across worker_queues
+worker_scheduler = WorkerScheduler(worker_queues, routing=ROUTING_STRATEGY)
+
+# Result store configuration
+RESULT_STORE_CAPACITY = 100000  # Most recent results kept in RAM
+RESULT_STORE_TTL = 3600  # Seconds before a result is only served from SQLite
+
+# Store processed results (bounded; evicted results are served from the requests table)
+processed_results = ResultStore(capacity=RESULT_STORE_CAPACITY, ttl_seconds=RESULT_STORE_TTL)
+
+# Push finished results to SSE / WebSocket subscribers instead of making them poll /status
+RESULT_STREAM_BUFFER = 1000  # Results buffered per subscriber before the oldest are dropped
+RESULT_STREAM_HEARTBEAT = 15  # Seconds between keep-alives on an idle stream
+result_hub = ResultHub(buffer_size=RESULT_STREAM_BUFFER)
+
+# Optional per-request deadline ("deadline_seconds" in the body); None = wait as long as it takes
+DEFAULT_DEADLINE_SECONDS = None
+
+def parse_deadline(value, now: float):
+    """Turn a relative "deadline_seconds" into an absolute time.monotonic() deadline (None = no deadline)"""
+    if value is None:
+        value = DEFAULT_DEADLINE_SECONDS
+        if value is None:
+            return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError(f"deadline_seconds must be a positive number, got {value!r}")
+    return now + value
+
+def validation_reason(error: ValidationError) -> str:
+    """One-line summary of a pydantic ValidationError, for per-item rejections"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'item'}: {detail['msg']}" for detail in error.errors()
+    )
+
+# Predicts completion time from the observed drain rate and enforces per-client token buckets
+admission = AdmissionController(
+    slo_seconds=LATENCY_SLO_SECONDS,
+    client_rate=CLIENT_RATE_PER_SECOND,
+    client_burst=CLIENT_BURST
+)
+
+# Requests accepted but not finished yet: request_id -> 'queued' | 'processing'
+inflight_requests = {}
+
+# Set by shutdown: new submissions are refused while in-flight work finishes
+draining = False
+# time.monotonic() by which in-flight work must be done once shutdown starts (None = no limit)
+drain_deadline = None
+
+# Proxy to the shared JobBroker (scale-out mode only)
+broker_client = None
+
+# Structured event log: no formatting on the hot path, a background thread writes it
+LOG_LEVEL = "INFO"  # DEBUG shows every routing/dispatch/stage event
+LOG_FORMAT = "text"  # "json" for JSON lines
+LOG_SAMPLE_RATES = {}  # Per-event sampling, e.g. {"request_completed": 0.01}
+log = EventLogger(level=LOG_LEVEL, fmt=LOG_FORMAT, sample_rates=LOG_SAMPLE_RATES)
+
+# Per-request lifecycle spans (queue, executor wait, stages, DB write) in a ring buffer, at /debug/trace
+TRACE_CAPACITY = 10000  # Most recent request traces kept; 0 disables tracing
+TRACE_SAMPLE_RATE = 1.0  # Fraction of requests traced
+tracer = Tracer(capacity=TRACE_CAPACITY, sample_rate=TRACE_SAMPLE_RATE)
+
+# On-demand stack sampler behind /debug/profile; no thread or hook exists until a profile is requested
+PROFILE_INTERVAL = 0.01  # Seconds between samples (100 Hz)
+PROFILE_MAX_SECONDS = 60
+profiler = SamplingProfiler(interval=PROFILE_INTERVAL, max_seconds=PROFILE_MAX_SECONDS)
+
+# In-memory metrics, exposed in Prometheus text format at /metrics
+metrics = MetricsRegistry()
+requests_received = metrics.counter("requests_received", "Requests accepted for processing", ("endpoint",))
+requests_rejected = metrics.counter("requests_rejected", "Requests rejected at admission", ("reason",))
+requests_completed = metrics.counter("requests_completed", "Requests whose pipeline finished")
+requests_failed = metrics.counter("requests_failed", "Requests that failed after all retries")
+retries_total = metrics.counter("retries", "Pipeline retries", ("outcome",))
+requests_expired = metrics.counter("requests_expired", "Requests dropped because their deadline passed", ("where",))
+queue_wait_seconds = metrics.histogram("queue_wait_seconds", "Time from acceptance to dequeue by a worker")
+stage_seconds = metrics.histogram("stage_seconds", "Time spent in each pipeline stage", ("stage",))
+pipeline_seconds = metrics.histogram("pipeline_seconds", "Pipeline processing time per request")
+end_to_end_seconds = metrics.histogram("end_to_end_seconds", "Time from acceptance to completion")
+db_flush_seconds = metrics.histogram("db_flush_seconds", "Write-behind tracker group-commit time")
+db_records_written = metrics.counter("db_records_written", "Records committed by the write-behind tracker")
+
+def observe_db_flush(seconds: float, records: int):
+    db_flush_seconds.observe(seconds)
+    db_records_written.inc(records)
+
+# Write-behind tracker: one WAL connection owned by a writer thread
+request_tracker = RequestTracker(DATABASE_PATH, batch_size=DB_BATCH_SIZE, flush_interval=DB_FLUSH_INTERVAL,
+                                 on_flush=observe_db_flush)
+
+# Gauges are read at scrape time, so they cost nothing on the hot path
+queue_depth = metrics.gauge("queue_depth", "Items waiting in each worker queue", ("worker",))
+for _worker_id, _queue in enumerate(worker_queues):
+    queue_depth.labels(_worker_id).set_function(_queue.qsize)
+metrics.gauge("inflight_requests", "Requests queued or running").set_function(lambda: len(inflight_requests))
+metrics.gauge("db_pending_records", "Records waiting in the write-behind tracker").set_function(request_tracker.pending)
 
 # Database functions
+# Per-request scheduling state stored on the row, so a replay after a restart restores it
+REPLAY_COLUMNS = (("deadline_at", "REAL"), ("priority", "INTEGER"), ("tenant", "TEXT"), ("client", "TEXT"))
+
 def init_database():
     """Initialize SQLite database with required tables"""
     conn = sqlite3.connect(DATABASE_PATH)
+    # Only takes effect on a new database (before the first table); lets retention return freed pages
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('PRAGMA journal_mode=WAL')
     cursor = conn.cursor()
     
     # Create requests table
@@ -47,190 +210,266 @@ def init_database():
             step2_result TEXT,
             final_result TEXT,
             thread_id INTEGER,
-            error_message TEXT
+            error_message TEXT,
+            deadline_at REAL,
+            priority INTEGER,
+            tenant TEXT,
+            client TEXT
         )
     ''')
+    # Databases from before replay kept deadline / priority / tenant get the columns added
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(requests)')}
+    for column, kind in REPLAY_COLUMNS:
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE requests ADD COLUMN {column} {kind}')
+    
+    # Recovery and status breakdowns filter on status
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_status ON requests(status)')
+    
+    # Queue history: totals per snapshot plus one (timestamp, worker_id, depth) row per worker
+    queue_metrics.create_schema(cursor)
     
-    # Create queue_metrics table
+    # Status counts (triggers) and per-minute rollups (maintained by the tracker)
+    rollups.create_schema(cursor)
+    
+    # Manifest of archived day partitions
+    retention.create_schema(cursor)
+    
+    # Persistent tier of the pipeline memo cache
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS queue_metrics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TIMESTAMP,
-            total_queued INTEGER,
-            worker_0_queue INTEGER,
-            worker_1_queue INTEGER,
-            worker_2_queue INTEGER,
-            worker_3_queue INTEGER,
-            active_threads INTEGER,
-            processed_requests INTEGER
+        CREATE TABLE IF NOT EXISTS memo_cache (
+            key TEXT PRIMARY KEY,
+            version TEXT,
+            outputs TEXT,
+            created_at TIMESTAMP
         )
     ''')
     
     conn.commit()
+    rollups.backfill(conn)
     conn.close()
     print(f"✅ Database initialized: {DATABASE_PATH}")
 
 def save_request_to_db(request_data: Dict, worker_id: int):
-    """Save request details to database"""
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO requests 
-            (id, text, worker_id, status, created_at, queued_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            request_data.get('id'),
-            request_data.get('text', ''),
-            worker_id,
-            'queued',
-            datetime.now().isoformat(),
-            datetime.now().isoformat()
-        ))
-        
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"❌ Database error saving request: {e}")
+    """Queue the request insert for the write-behind tracker (never blocks on disk)"""
+    now = datetime.now().isoformat()
+    request_tracker.record_queued(
+        request_data.get('id'),
+        request_data.get('text', ''),
+        worker_id,
+        now,
+        now,
+        *replay_fields(request_data)
+    )
+
+def replay_fields(request_data: Dict) -> tuple:
+    """(deadline_at, priority, tenant, client) for the requests row; the deadline becomes wall-clock time"""
+    deadline = request_data.get("_deadline")
+    deadline_at = None if deadline is None else time.time() + (deadline - time.monotonic())
+    return deadline_at, request_data.get("_priority"), request_data.get("_tenant"), request_data.get("_client")
 
 def update_request_status(request_id: str, status: str, **kwargs):
-    """Update request status and additional fields"""
+    """Queue a status transition; the tracker coalesces it with others for the same id"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Build dynamic update query
-        fields = []
-        values = []
-        
-        if 'started_at' in kwargs:
-            fields.append('started_at = ?')
-            values.append(kwargs['started_at'])
-        
-        if 'completed_at' in kwargs:
-            fields.append('completed_at = ?')
-            values.append(kwargs['completed_at'])
-        
-        if 'processing_time' in kwargs:
-            fields.append('processing_time = ?')
-            values.append(kwargs['processing_time'])
-        
-        if 'step1_result' in kwargs:
-            fields.append('step1_result = ?')
-            values.append(kwargs['step1_result'])
-        
-        if 'step2_result' in kwargs:
-            fields.append('step2_result = ?')
-            values.append(kwargs['step2_result'])
-        
-        if 'final_result' in kwargs:
-            fields.append('final_result = ?')
-            values.append(kwargs['final_result'])
-        
-        if 'thread_id' in kwargs:
-            fields.append('thread_id = ?')
-            values.append(kwargs['thread_id'])
-        
-        if 'error_message' in kwargs:
-            fields.append('error_message = ?')
-            values.append(kwargs['error_message'])
-        
-        fields.append('status = ?')
-        values.append(status)
-        values.append(request_id)
-        
-        query = f"UPDATE requests SET {', '.join(fields)} WHERE id = ?"
-        cursor.execute(query, values)
-        
-        conn.commit()
-        conn.close()
+        request_tracker.record_status(request_id, status, **kwargs)
     except Exception as e:
         print(f"❌ Database error updating request {request_id}: {e}")
 
-def save_queue_metrics():
-    """Save current queue metrics to database"""
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        worker_queue_sizes = [q.qsize() for q in worker_queues]
-        active_threads = sum(len(pool._threads) for pool in worker_thread_pools.values())
-        
-        cursor.execute('''
-            INSERT INTO queue_metrics 
-            (timestamp, total_queued, worker_0_queue, worker_1_queue, worker_2_queue, worker_3_queue, active_threads, processed_requests)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now().isoformat(),
-            sum(worker_queue_sizes),
-            worker_queue_sizes[0],
-            worker_queue_sizes[1],
-            worker_queue_sizes[2],
-            worker_queue_sizes[3],
-            active_threads,
-            len(processed_results)
-        ))
-        
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"❌ Database error saving metrics: {e}")
-
-# Worker function to process tasks from the queue
-def fun_1(v):
-    time.sleep(2)  # Simulates a blocking operation
-    return "fun_1"
+def read_queue_sample():
+    """(per-worker queue depths, active threads, processed requests) for the queue sampler"""
+    worker_queue_sizes = [q.qsize() for q in worker_queues]
+    active_threads = sum(len(pool._threads) for pool in worker_thread_pools.values())
+    return worker_queue_sizes, active_threads, processed_results.total_stored
 
-def fun_2(v):
-    time.sleep(1)  # Simulates another blocking operation
-    return "fun_2"
+# Pipeline declared as a DAG of stages. step1 and step2 only need the input text,
+# so they run concurrently; step3 waits for both.
+# Backends: "thread" (worker's thread pool, blocking I/O), "process" (shared
+# process pool, CPU-bound, picklable payloads), "asyncio" (native coroutine).
+# The stage functions live in stages.py so the process backend can pickle them.
+PIPELINE = PipelineDAG([
+    Stage("step1", fun_1, fun_1_async, inputs=("text",), backend=BACKEND_THREAD),
+    Stage("step2", fun_2, fun_2_async, inputs=("text",), backend=BACKEND_THREAD),
+    Stage("step3", fun_3, fun_3_async, inputs=("text", "step1", "step2"), backend=BACKEND_THREAD),
+])
+PROCESS_POOL_WORKERS = None  # None = os.cpu_count()
+# A request can hold one pool thread per thread-backend stage it runs in parallel,
+# so a worker pulls only as many requests as its pool can run side by side
+REQUESTS_PER_WORKER = max(1, THREADS_PER_WORKER // max(1, PIPELINE.width(BACKEND_THREAD)))
 
 # Create thread pools for each worker
 worker_thread_pools = {}
+worker_thread_backends = {}
+
+# Elastic thread pools: sized from queue depth and stage latency instead of reserving THREADS_PER_WORKER each
+AUTOSCALE_POOLS = True
+MIN_THREADS_PER_WORKER = 16  # Floor per worker; THREADS_PER_WORKER is the per-worker ceiling
+MAX_TOTAL_THREADS = MAX_CONCURRENT_REQUESTS  # Global ceiling across all worker pools
+AUTOSCALE_INTERVAL = 0.5  # Seconds between sizing decisions
+
+def log_pool_scaled(worker_id: int, old_target: int, new_target: int, inputs: Dict):
+    log.event("pool_scaled", INFO, worker_id=worker_id, old_target=old_target, new_target=new_target,
+              queue_depth=inputs.get("queue_depth"), arrival_rate=round(inputs.get("arrival_rate", 0.0), 1),
+              avg_task_seconds=round(inputs.get("avg_task_seconds", 0.0), 3))
+
+pool_autoscaler = PoolAutoscaler(
+    worker_thread_pools,
+    queue_depth=lambda worker_id: worker_queues[worker_id].qsize(),
+    max_total_threads=MAX_TOTAL_THREADS,
+    interval=AUTOSCALE_INTERVAL,
+    on_scale=log_pool_scaled
+)
+autoscaler_task = None
+
+# Retention: finished requests older than RETENTION_DAYS move to per-day gzip JSONL files
+RETENTION_DAYS = 7  # None keeps everything in the live table
+ARCHIVE_DIR = "archive"
+RETENTION_INTERVAL = 3600  # Seconds between retention runs
+ARCHIVE_INDEX_DAYS = 30  # Archived requests stay findable by /status for this many days after archival
+retention_manager = retention.RetentionManager(DATABASE_PATH, ARCHIVE_DIR, retention_days=RETENTION_DAYS,
+                                               index_days=ARCHIVE_INDEX_DAYS)
+retention_task = None
+
+# Queue history: sampled on a fixed interval into a ring buffer, written to queue_metrics in batches
+QUEUE_SAMPLE_INTERVAL = 1.0  # Seconds between samples
+QUEUE_HISTORY_CAPACITY = 3600  # Samples kept in memory for /queue-status/history (1 hour)
+QUEUE_METRICS_FLUSH_INTERVAL = 10.0  # Seconds between batched writes to SQLite
+queue_sampler = queue_metrics.QueueSampler(
+    read_queue_sample,
+    request_tracker.record_metrics,
+    interval=QUEUE_SAMPLE_INTERVAL,
+    capacity=QUEUE_HISTORY_CAPACITY,
+    flush_interval=QUEUE_METRICS_FLUSH_INTERVAL
+)
+sampler_task = None
+
+async def retention_loop():
+    """Archive old partitions off the event loop, once per RETENTION_INTERVAL"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            archived = await loop.run_in_executor(None, retention_manager.run_once)
+            if archived:
+                log.event("partitions_archived", INFO, days=len(archived), rows=sum(archived.values()),
+                          seconds=round(retention_manager.last_run_seconds, 3))
+        except Exception as e:
+            log.event("retention_failed", ERROR, error=str(e))
+        await asyncio.sleep(RETENTION_INTERVAL)
+
+# Shared backends (the process pool is only started if a stage uses it)
+process_backend = ProcessBackend(max_workers=PROCESS_POOL_WORKERS)
+asyncio_backend = AsyncioBackend()
 
 async def worker(worker_id: int):
     """Worker that continuously pulls requests and submits them to thread pool"""
     print(f"🚀 Worker {worker_id} started with {THREADS_PER_WORKER} threads")
     
     # Create a dedicated thread pool for this worker
-    thread_pool = ThreadPoolExecutor(max_workers=THREADS_PER_WORKER, 
-                                   thread_name_prefix=f"Worker-{worker_id}")
+    if AUTOSCALE_POOLS:
+        thread_pool = ElasticThreadPool(min_threads=MIN_THREADS_PER_WORKER, max_threads=THREADS_PER_WORKER,
+                                        thread_name_prefix=f"Worker-{worker_id}")
+    else:
+        thread_pool = ThreadPoolExecutor(max_workers=THREADS_PER_WORKER, 
+                                       thread_name_prefix=f"Worker-{worker_id}")
     worker_thread_pools[worker_id] = thread_pool
+    worker_thread_backends[worker_id] = ThreadBackend(thread_pool)
     
     # Track active tasks for this worker
     active_tasks = set()
+    # Only pull as many requests as the pool can run all at once (each one can occupy
+    # a thread per parallel stage), so the backlog stays in worker_queues where idle
+    # siblings can steal it
+    capacity = asyncio.Semaphore(REQUESTS_PER_WORKER)
+    
+    def on_task_done(task):
+        active_tasks.discard(task)
+        capacity.release()
     
     try:
         while True:
-            try:
-                # Use get_nowait() to avoid blocking - workers can pull simultaneously
-                data = worker_queues[worker_id].get_nowait()
-            except asyncio.QueueEmpty:
-                # If queue is empty, wait a tiny bit and try again
-                await asyncio.sleep(0.001)
-                continue
+            await capacity.acquire()
+            # Wait (without polling) for our own work, or steal from the longest sibling queue
+            data = await worker_scheduler.get(worker_id)
                 
             if data is None:
+                capacity.release()
                 break
             
+            try:
+                dequeued_at = time.monotonic()
+                queue_wait = dequeued_at - data.get("_enqueued_at", dequeued_at)
+                admission.record_dequeue(queue_wait)
+                queue_wait_seconds.observe(queue_wait)
+                trace = data.get("_trace")
+                if trace is not None:
+                    trace.span("queue", dequeued_at - queue_wait, dequeued_at, worker_id=worker_id)
+                
+                # Shed work nobody is waiting for any more instead of spending a pipeline run on it
+                deadline = data.get("_deadline")
+                if deadline is not None and time.monotonic() >= deadline:
+                    capacity.release()
+                    expire_request(data, "queue", f"Deadline passed after {queue_wait:.3f}s in queue")
+                    continue
+            except Exception as e:
+                # One malformed item fails on its own; it must not end this worker's loop
+                capacity.release()
+                fail_malformed_request(data, worker_id, e)
+                continue
+            
             # Submit the request to thread pool immediately without waiting
             # This allows the worker to continue pulling more requests
             task = asyncio.create_task(process_request_in_threadpool(data, worker_id, thread_pool))
             active_tasks.add(task)
+            task.add_done_callback(on_task_done)
             
-            # Clean up completed tasks
-            active_tasks = {t for t in active_tasks if not t.done()}
-            
-            print(f"📤 Worker {worker_id} submitted request {data.get('id', 'unknown')} to thread pool. Active tasks: {len(active_tasks)}")
+            if log.enabled("request_submitted", DEBUG):
+                log.event("request_submitted", DEBUG, request_id=data.get('id'), worker_id=worker_id, active_tasks=len(active_tasks))
             
     finally:
-        # Wait for all active tasks to complete
-        if active_tasks:
-            await asyncio.gather(*active_tasks, return_exceptions=True)
-        # Clean up thread pool
-        thread_pool.shutdown(wait=True)
-        print(f"🛑 Worker {worker_id} thread pool shutdown complete")
+        # Let active tasks finish, but never past the shutdown deadline: the cancel from
+        # shutdown may already have been spent on capacity.acquire(). Whatever is still
+        # running then is cancelled (its row stays 'processing' and is resumed on restart)
+        cut_short = False
+        try:
+            if active_tasks:
+                timeout = None if drain_deadline is None else max(0.0, drain_deadline - time.monotonic())
+                _, unfinished = await asyncio.wait(set(active_tasks), timeout=timeout)
+                cut_short = bool(unfinished)
+        except asyncio.CancelledError:
+            cut_short = True
+            raise
+        finally:
+            if cut_short:
+                for task in list(active_tasks):
+                    task.cancel()
+                thread_pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                thread_pool.shutdown(wait=True)
+            print(f"🛑 Worker {worker_id} thread pool shutdown complete")
+
+def fail_malformed_request(data: Dict, worker_id: int, error: Exception):
+    """Mark a request that could not even be dispatched 'failed'"""
+    request_id = data.get('id', 'unknown') if isinstance(data, dict) else 'unknown'
+    error_msg = f"Malformed queue item: {error}"
+    update_request_status(request_id, 'failed', error_message=error_msg)
+    processed_results.put(request_id, {"request_id": request_id, "status": "failed", "error_message": error_msg})
+    inflight_requests.pop(request_id, None)
+    requests_failed.inc()
+    log.event("request_failed", ERROR, request_id=request_id, worker_id=worker_id, error=error_msg)
+
+def expire_request(data: Dict, where: str, reason: str):
+    """Mark a request 'expired' everywhere a client could look for it"""
+    request_id = data.get('id', 'unknown')
+    expired = {"request_id": request_id, "status": "expired", "error_message": reason}
+    update_request_status(request_id, 'expired', completed_at=datetime.now().isoformat(), error_message=reason)
+    processed_results.put(request_id, expired)
+    inflight_requests.pop(request_id, None)
+    result_hub.publish(request_id, data.get("_client"), expired)
+    admission.record_completion(None)
+    requests_expired.labels(where).inc()
+    trace = data.get("_trace")
+    if trace is not None:
+        trace.finish("expired", where=where)
+    log.event("request_expired", INFO, request_id=request_id, where=where, reason=reason)
 
 async def process_request_in_threadpool(data: Dict, worker_id: int, thread_pool: ThreadPoolExecutor):
     """Process a single request in the worker's thread pool"""
@@ -238,13 +477,28 @@ async def process_request_in_threadpool(data: Dict, worker_id: int, thread_pool:
     
     try:
         # Update status to started
+        inflight_requests[request_id] = 'processing'
         update_request_status(request_id, 'processing', started_at=datetime.now().isoformat())
         
-        result = await execute_task_with_retries(pipeline, data, worker_id, thread_pool)
+        # Stage outputs survive failed attempts, so a retry resumes at the stage that failed
+        checkpoint = {}
+        result = await execute_task_with_retries(pipeline, data, worker_id, thread_pool, checkpoint)
         
         # Store the result with the request ID
         if "id" in data:
-            processed_results[data["id"]] = result
+            processed_results.put(data["id"], result)
+            inflight_requests.pop(data["id"], None)
+            result_hub.publish(data["id"], data.get("_client"), result)
+        admission.record_completion(result.get('processing_time'))
+        requests_completed.inc()
+        pipeline_seconds.observe(result.get('processing_time') or 0.0)
+        if "_enqueued_at" in data:
+            end_to_end_seconds.observe(time.monotonic() - data["_enqueued_at"])
+        
+        trace = data.get("_trace")
+        if trace is not None:
+            trace.finish("completed", cache=result.get("cache"))
+            trace_db_write(trace)
         
         # Update status to completed
         update_request_status(
@@ -258,67 +512,222 @@ async def process_request_in_threadpool(data: Dict, worker_id: int, thread_pool:
             thread_id=result.get('thread_id')
         )
         
-        print(f"✅ Worker {worker_id} completed request {request_id}")
+        log.event("request_completed", INFO, request_id=request_id, worker_id=worker_id,
+                  processing_time=result.get('processing_time'))
         return result
         
+    except DeadlineExceeded as e:
+        expire_request(data, "pipeline", str(e))
+        return None
+        
     except Exception as e:
         error_msg = str(e)
         update_request_status(request_id, 'failed', error_message=error_msg)
-        print(f"❌ Worker {worker_id} failed to process request {request_id}: {e}")
+        failure = {"request_id": request_id, "status": "failed", "error_message": error_msg}
+        processed_results.put(request_id, failure)
+        result_hub.publish(request_id, data.get("_client"), failure)
+        admission.record_completion(None)
+        requests_failed.inc()
+        inflight_requests.pop(request_id, None)
+        trace = data.get("_trace")
+        if trace is not None:
+            trace.finish("failed", error=error_msg)
+            trace_db_write(trace)
+        log.event("request_failed", ERROR, request_id=request_id, worker_id=worker_id, error=error_msg)
         return None
 
-async def execute_task_with_retries(func, *args, retries=3):
+def trace_db_write(trace):
+    """Span from the final status write being queued to its group commit (ends on the writer thread)"""
+    queued_at = time.monotonic()
+    request_tracker.when_committed(lambda ok: trace.span("db_write", queued_at, time.monotonic(), ok=ok))
+
+async def execute_task_with_retries(func, *args, retries=None):
+    retries = retries or retry_policy.max_attempts
+    retry_budget.record_request()
     for attempt in range(retries):
         try:
             result = await func(*args)
             return result
+        except (DeadlineExceeded, CircuitOpenError):
+            # Retrying can only be later still / the dependency is known to be down
+            raise
         except Exception as e:
-            print(f"Attempt {attempt + 1} failed with error: {e}")
             if attempt + 1 == retries:
-                print(f"Task failed after {retries} attempts.")
+                log.event("attempt_failed", WARNING, attempt=attempt + 1, retries=retries, error=str(e))
+                raise
+            if not retry_budget.try_acquire():
+                retries_total.labels("budget_exhausted").inc()
+                log.event("retry_budget_exhausted", WARNING, attempt=attempt + 1, error=str(e))
                 raise
-            await asyncio.sleep(1)
+            delay = retry_policy.backoff(attempt)
+            retries_total.labels("scheduled").inc()
+            log.event("attempt_failed", WARNING, attempt=attempt + 1, retries=retries, error=str(e), retry_in=round(delay, 3))
+            await asyncio.sleep(delay)
+
+# Retries: exponential backoff with full jitter, a global retry budget and per-stage circuit breakers
+retry_policy = RetryPolicy(max_attempts=3, base_delay=0.2, max_delay=5.0)
+retry_budget = RetryBudget(ratio=0.1, min_per_second=10)
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open a stage's breaker
+BREAKER_RESET_TIMEOUT = 10  # Seconds before an open breaker lets one probe through
+stage_breakers = {
+    stage.name: CircuitBreaker(stage.name, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+    for stage in PIPELINE.order
+}
+circuit_open = metrics.gauge("circuit_open", "1 while a stage's circuit breaker is open or half-open", ("stage",))
+for _name, _breaker in stage_breakers.items():
+    circuit_open.labels(_name).set_function(lambda b=_breaker: 0 if b.state == BREAKER_CLOSED else 1)
+
+# Memoization of pipeline outputs, keyed by hash(PIPELINE_VERSION, normalized text)
+MEMO_ENABLED = True
+MEMO_CAPACITY = 100000  # Outputs kept in the in-memory LRU tier
+PIPELINE_VERSION = "1"  # Bump whenever a stage's output changes to invalidate the cache
+memo = MemoCache(request_tracker, version=PIPELINE_VERSION, capacity=MEMO_CAPACITY)
 
 # Function to enqueue tasks - distribute across workers
-async def process_request(data: Dict):
-    # Distribute requests across workers using round-robin
-    worker_id = hash(data.get('id', str(uuid.uuid4()))) % MAX_WORKERS
+async def process_request(data: Dict, worker_id: int = None, persisted: bool = False):
+    # Distribute requests across workers (hash or least-loaded placement)
+    if worker_id is None:
+        worker_id = worker_scheduler.route(data.get('id', str(uuid.uuid4())))
     
     # Check if this worker's queue is full
     if worker_queues[worker_id].qsize() >= MAX_QUEUE_SIZE:
+        inflight_requests.pop(data.get('id'), None)
         raise Exception(f"Worker {worker_id} queue is full")
     
-    await worker_queues[worker_id].put(data)
-    print(f"📥 Request {data.get('id', 'unknown')} routed to Worker {worker_id}")
+    await worker_scheduler.put(data, worker_id)
+    if log.enabled("request_routed", DEBUG):
+        log.event("request_routed", DEBUG, request_id=data.get('id'), worker_id=worker_id)
+    trace = data.get("_trace")
+    if trace is not None:
+        trace.instant("routed", worker_id=worker_id)
+    
+    # Save to database (durable mode already committed it before acknowledging)
+    if not persisted:
+        save_request_to_db(data, worker_id)
+
+async def wait_for_commit():
+    """Wait, without blocking the loop, until the tracker has committed everything enqueued so far"""
+    loop = asyncio.get_running_loop()
+    committed = loop.create_future()
+    
+    def resolve(ok):
+        if not committed.done():
+            committed.set_result(ok)
     
-    # Save to database
-    save_request_to_db(data, worker_id)
+    request_tracker.when_committed(lambda ok: loop.call_soon_threadsafe(resolve, ok))
+    if not await committed:
+        raise HTTPException(status_code=503, detail="Could not persist request")
 
-# Your pipeline logic - now runs in a single thread per request
-def pipeline_sync(data: Dict, worker_id: int):
-    """Synchronous version of pipeline that runs in a single thread"""
+async def recover_unfinished_requests():
+    """Bulk-replay requests a previous run left unfinished (drained or crashed), without re-inserting rows"""
+    loop = asyncio.get_event_loop()
+    started = time.perf_counter()
+    chunks = await loop.run_in_executor(None, lambda: list(request_tracker.iter_unfinished()))
+    loaded = time.perf_counter()
+    
+    enqueued_at = time.monotonic()
+    depth = [q.qsize() for q in worker_queues]
+    assignments = []
+    skipped = 0
+    expired = 0
+    for rows in chunks:
+        for request_id, text, worker_id, deadline_at, priority, tenant, client in rows:
+            data = {"id": request_id, "text": text, "_enqueued_at": enqueued_at}
+            if priority is not None:
+                data["_priority"] = priority
+            if tenant is not None:
+                data["_tenant"] = tenant
+            if client is not None:
+                data["_client"] = client
+            if deadline_at is not None:
+                # Wall-clock deadline back onto this process's monotonic clock
+                data["_deadline"] = enqueued_at + (deadline_at - time.time())
+                if data["_deadline"] <= enqueued_at:
+                    # Nobody is waiting for it any more: shed it instead of replaying it
+                    expire_request(data, "recovery", "Deadline passed before the request could be replayed")
+                    expired += 1
+                    continue
+            if worker_id is None or not 0 <= worker_id < MAX_WORKERS:
+                worker_id = worker_scheduler.route(request_id)
+            if depth[worker_id] >= MAX_QUEUE_SIZE:
+                worker_id = min(range(MAX_WORKERS), key=lambda i: depth[i])
+                if depth[worker_id] >= MAX_QUEUE_SIZE:
+                    # Stays 'queued' in the DB and is picked up by the next restart
+                    skipped += 1
+                    continue
+            depth[worker_id] += 1
+            assignments.append((data, worker_id))
+            inflight_requests[request_id] = 'queued'
+    worker_scheduler.put_many(assignments)
+    
+    elapsed = time.perf_counter() - started
+    rate = len(assignments) / elapsed if elapsed > 0 else 0
+    print(f"♻️ Recovered {len(assignments)} unfinished requests in {elapsed:.3f}s "
+          f"(DB scan {loaded - started:.3f}s, {rate:,.0f} req/s)"
+          + (f", {expired} expired" if expired else "")
+          + (f", {skipped} left in DB because the queues are full" if skipped else ""))
+
+# Your pipeline logic - each stage runs on its configured executor backend
+async def run_stage(stage: Stage, worker_id: int, *args):
+    """Run one pipeline stage on its backend behind its circuit breaker; returns (value, thread_id, elapsed)"""
+    breaker = stage_breakers[stage.name]
+    probe = breaker.before_call()
+    try:
+        if stage.backend == BACKEND_ASYNCIO:
+            outcome = await asyncio_backend.run(stage.async_func, *args)
+        elif stage.backend == BACKEND_PROCESS:
+            outcome = await process_backend.run(stage.func, *args)
+        else:
+            outcome = await worker_thread_backends[worker_id].run(stage.func, *args)
+    except asyncio.CancelledError:
+        # A sibling stage failed; says nothing about this stage's dependency
+        if probe:
+            breaker.release_probe()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return outcome
+
+async def pipeline(data: Dict, worker_id: int, thread_pool: ThreadPoolExecutor, checkpoint: Dict = None):
+    """Run the pipeline DAG for one request; independent stages overlap"""
     start_time = time.perf_counter()
     
     request_id = data["id"]
     text = data.get("text", "default_text")
     
-    print(f"🔄 Worker {worker_id} processing request {request_id}: {text}")
+    if log.enabled("pipeline_started", DEBUG):
+        log.event("pipeline_started", DEBUG, request_id=request_id, worker_id=worker_id)
+    trace = data.get("_trace")
     
-    # Simulate some processing steps
-    v = text
+    async def runner(stage: Stage, *args):
+        submitted_at = time.monotonic()
+        outcome = await run_stage(stage, worker_id, *args)
+        stage_seconds.labels(stage.name).observe(outcome[2])
+        if trace is not None:
+            # The stage reports its own run time; the rest is executor backlog (and the hop back)
+            finished_at = time.monotonic()
+            started_at = max(submitted_at, finished_at - outcome[2])
+            trace.span("executor_wait", submitted_at, started_at, stage=stage.name)
+            trace.span(stage.name, started_at, finished_at, backend=stage.backend, thread_id=outcome[1])
+        if log.enabled("stage_completed", DEBUG):
+            log.event("stage_completed", DEBUG, request_id=request_id, worker_id=worker_id, stage=stage.name, elapsed=outcome[2])
+        return outcome
     
-    # Step 1: Process with fun_1 (simulates some computation)
-    result1 = fun_1(v)
-    print(f"  ✅ Worker {worker_id} - Step 1 completed for {request_id}: {result1}")
+    computed = {}
     
-    # Step 2: Process with fun_2 (simulates another computation)
-    result2 = fun_2(v)
-    print(f"  ✅ Worker {worker_id} - Step 2 completed for {request_id}: {result2}")
+    async def compute():
+        computed.update(await PIPELINE.run({"text": text}, runner, deadline=data.get("_deadline"),
+                                            checkpoint=checkpoint))
+        return {name: outcome[0] for name, outcome in computed.items()}
     
-    # Step 3: Simulate additional processing
-    time.sleep(0.5)  # Simulate additional processing
-    processed_text = f"processed_{text}_{result1}_{result2}"
-    print(f"  ✅ Worker {worker_id} - Step 3 completed for {request_id}: {processed_text}")
+    # Repeated texts reuse earlier outputs; identical requests in flight share one run
+    if MEMO_ENABLED:
+        values, source = await memo.get_or_compute(text, compute)
+    else:
+        values, source = await compute(), SOURCE_COMPUTED
+    thread_id = computed["step3"][1] if computed else None
     
     end_time = time.perf_counter()
     processing_time = end_time - start_time
@@ -326,77 +735,487 @@ def pipeline_sync(data: Dict, worker_id: int):
     result = {
         "request_id": request_id,
         "original_text": text,
-        "step1_result": result1,
-        "step2_result": result2,
-        "final_result": processed_text,
+        "step1_result": values["step1"],
+        "step2_result": values["step2"],
+        "final_result": values["step3"],
         "processing_time": processing_time,
+        "stage_times": {name: outcome[2] for name, outcome in computed.items()},
+        "cache": source,
         "worker_id": worker_id,
-        "thread_id": threading.current_thread().ident,
+        "thread_id": thread_id,
         "timestamp": datetime.now().isoformat(),
         "status": "completed",
         "optimization": "separate_queues_maximum_parallelism"
     }
     
-    print(f"🎯 Worker {worker_id} - Request {request_id} completed in {processing_time:.3f}s")
-    print(f"Processed: {data}")
     
     return result
 
-async def pipeline(data: Dict, worker_id: int, thread_pool: ThreadPoolExecutor):
-    """Async wrapper that submits the pipeline to the worker's thread pool"""
-    # Submit the synchronous pipeline to the worker's thread pool
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(thread_pool, pipeline_sync, data, worker_id)
-    return result
-
-@app.post("/process")
-async def process(data: Dict, background_tasks: BackgroundTasks):
+@app.post("/process", openapi_extra=openapi_body(ProcessRequest), responses={200: {"model": ProcessResponse}})
+async def process(request: Request, background_tasks: BackgroundTasks, ack: str = None):
+    reject_if_draining()
+    ack = ack or PROCESS_ACK
+    if ack not in ACK_MODES:
+        raise HTTPException(status_code=422, detail=f"ack must be one of {list(ACK_MODES)}")
+    # Typed fast path: parse and validate the raw body in one compiled pass
+    try:
+        body = ProcessRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    # Optional "priority" ("high" / "normal" / "low") and "tenant" (defaults to the client key)
+    try:
+        priority = parse_priority(body.priority)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    tenant = body.tenant or client_key(request)
+    try:
+        deadline = parse_deadline(body.deadline_seconds, time.monotonic())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    data = {} if body.text is None else {"text": body.text}
+    
     # Check total queue size across all workers
     total_queued = sum(q.qsize() for q in worker_queues)
     
     if total_queued >= MAX_QUEUE_SIZE * MAX_WORKERS:
+        requests_rejected.labels("queue_full").inc()
         raise HTTPException(
             status_code=503, 
-            detail=f"System overloaded. Total queued: {total_queued}, Max capacity: {MAX_QUEUE_SIZE * MAX_WORKERS}"
+            detail=f"System overloaded. Total queued: {total_queued}, Max capacity: {MAX_QUEUE_SIZE * MAX_WORKERS}",
+            headers={"Retry-After": str(admission.retry_after(total_queued))}
         )
     
+    # Per-client rate limit, then the latency SLO
+    admitted, status_code, retry_after, reason = admission.admit(client_key(request), total_queued)
+    if not admitted:
+        requests_rejected.labels("rate_limit" if status_code == 429 else "slo").inc()
+        raise HTTPException(status_code=status_code, detail=reason, headers={"Retry-After": str(retry_after)})
+    
     # Generate a unique ID for this request
     request_id = str(uuid.uuid4())
     data["id"] = request_id
+    data["_enqueued_at"] = time.monotonic()
+    data["_client"] = client_key(request)
+    data["_priority"] = priority
+    data["_tenant"] = tenant
+    if deadline is not None:
+        data["_deadline"] = deadline
+    
+    if log.enabled("request_received", DEBUG):
+        log.event("request_received", DEBUG, request_id=request_id)
+    
+    # Pick the queue now so the response reports the real assignment
+    worker_id = worker_scheduler.route(request_id)
+    inflight_requests[request_id] = 'queued'
+    requests_received.labels("process").inc()
+    
+    if SCALE_OUT_MODE:
+        # Shared job queue: any executor process on the box may pick it up
+        loop = asyncio.get_event_loop()
+        if not await loop.run_in_executor(None, broker_client.submit, data, os.getpid()):
+            inflight_requests.pop(request_id, None)
+            requests_rejected.labels("queue_full").inc()
+            raise HTTPException(status_code=503, detail="Shared job queue is full", headers={"Retry-After": "1"})
+        inflight_requests.pop(request_id, None)
+        if ack == ACK_MINIMAL:
+            return json_response({"status": "accepted", "request_id": request_id})
+        return json_response({
+            "status": "accepted",
+            "request_id": request_id,
+            "message": "Request queued for processing",
+            "worker_assigned": "shared",
+            "timestamp": datetime.now().isoformat()
+        })
+    
+    trace = tracer.start(request_id, at=data["_enqueued_at"], endpoint="process",
+                         priority=priority, tenant=tenant)
+    if trace is not None:
+        data["_trace"] = trace
     
-    print(f"📥 Received request {request_id}: {data}")
+    # Durable mode: the row is the source of truth, so commit it before acknowledging
+    persisted = False
+    if DURABLE_QUEUE:
+        save_request_to_db(data, worker_id)
+        await wait_for_commit()
+        persisted = True
+        if trace is not None:
+            trace.span("db_insert", data["_enqueued_at"], time.monotonic())
     
     # Add to background tasks
-    background_tasks.add_task(process_request, data)
+    background_tasks.add_task(process_request, data, worker_id, persisted)
     
-    return {
+    if ack == ACK_MINIMAL:
+        return json_response({"status": "accepted", "request_id": request_id})
+    return json_response({
         "status": "accepted", 
         "request_id": request_id,
         "message": "Request queued for processing",
-        "worker_assigned": hash(request_id) % MAX_WORKERS,
+        "worker_assigned": worker_id,
+        "priority": priority,
+        "tenant": tenant,
+        "deadline_seconds": None if deadline is None else (body.deadline_seconds or DEFAULT_DEADLINE_SECONDS),
         "total_queued": total_queued,
         "max_capacity": MAX_QUEUE_SIZE * MAX_WORKERS,
         "timestamp": datetime.now().isoformat()
+    })
+
+def reject_if_draining():
+    if draining:
+        requests_rejected.labels("draining").inc()
+        raise HTTPException(status_code=503, detail="Server is shutting down", headers={"Retry-After": "1"})
+
+def client_key(request: Request) -> str:
+    """Identify the caller for per-client fairness"""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+
+@app.post("/process/batch")
+async def process_batch(data: Dict, request: Request, response: Response):
+    """Accept many items in one call: one bulk enqueue and one bulk DB insert"""
+    reject_if_draining()
+    items = data.get("items")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Body must be {\"items\": [{...}, ...]}")
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(items)} items exceeds MAX_BATCH_SIZE={MAX_BATCH_SIZE}"
+        )
+    
+    now = datetime.now().isoformat()
+    enqueued_at = time.monotonic()
+    assignments = []
+    db_rows = []
+    results = []
+    # Queue depth as it will be after this batch, so placement sees earlier items of the batch
+    projected = [q.qsize() for q in worker_queues]
+    
+    # Admission: the client's tokens and the SLO headroom bound how many items get in
+    client = client_key(request)
+    # Batch-level priority / tenant, overridable per item
+    try:
+        batch_priority = parse_priority(data.get("priority"))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    batch_tenant = str(data.get("tenant") or client)
+    try:
+        batch_deadline = parse_deadline(data.get("deadline_seconds"), enqueued_at)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    granted, rate_wait = admission.take_tokens(client, len(items))
+    headroom = admission.slo_headroom(sum(projected))
+    allowed = granted if headroom is None else min(granted, headroom)
+    retry_after = 0
+    
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({"index": index, "status": "rejected", "reason": "item must be an object"})
+            continue
+        # Same typed validation as /process, so a bad item is rejected here and never reaches the writer
+        try:
+            body = ProcessRequest.model_validate(item)
+        except ValidationError as e:
+            results.append({"index": index, "status": "rejected", "reason": validation_reason(e)})
+            continue
+        try:
+            priority = parse_priority(body.priority) if body.priority is not None else batch_priority
+            deadline = (parse_deadline(body.deadline_seconds, enqueued_at)
+                        if body.deadline_seconds is not None else batch_deadline)
+        except ValueError as e:
+            results.append({"index": index, "status": "rejected", "reason": str(e)})
+            continue
+        
+        if len(assignments) >= allowed:
+            if len(assignments) >= granted:
+                admission.rejected_rate_limit += 1
+                requests_rejected.labels("rate_limit").inc()
+                results.append({"index": index, "status": "rejected", "reason": "client rate limit"})
+                retry_after = max(retry_after, math.ceil(rate_wait))
+            else:
+                admission.rejected_slo += 1
+                requests_rejected.labels("slo").inc()
+                results.append({"index": index, "status": "rejected", "reason": "latency SLO exceeded"})
+                retry_after = max(retry_after, admission.retry_after(sum(projected)))
+            continue
+        
+        request_id = str(uuid.uuid4())
+        worker_id = worker_scheduler.route(request_id)
+        if projected[worker_id] >= MAX_QUEUE_SIZE:
+            # Preferred queue is full: fall back to the shortest queue that still has room
+            worker_id = min(range(MAX_WORKERS), key=lambda i: projected[i])
+            if projected[worker_id] >= MAX_QUEUE_SIZE:
+                results.append({"index": index, "status": "rejected", "reason": "all worker queues are full"})
+                requests_rejected.labels("queue_full").inc()
+                continue
+        
+        projected[worker_id] += 1
+        # Only validated public fields are carried over; client keys never reach the internal "_" fields
+        item = {} if body.text is None else {"text": body.text}
+        item.update(id=request_id, _enqueued_at=enqueued_at, _client=client,
+                    _priority=priority, _tenant=body.tenant or batch_tenant)
+        if deadline is not None:
+            item["_deadline"] = deadline
+        if not SCALE_OUT_MODE:
+            trace = tracer.start(request_id, at=enqueued_at, endpoint="process_batch",
+                                 priority=priority, tenant=item["_tenant"])
+            if trace is not None:
+                item["_trace"] = trace
+        assignments.append((item, worker_id))
+        db_rows.append((request_id, body.text or '', worker_id, now, now) + replay_fields(item))
+        inflight_requests[request_id] = 'queued'
+        accepted_item = {"index": index, "status": "accepted", "request_id": request_id}
+        if not SCALE_OUT_MODE:
+            accepted_item["worker_assigned"] = worker_id
+        results.append(accepted_item)
+    
+    if SCALE_OUT_MODE and assignments:
+        # Executors record the rows; whatever the shared queue can't hold is rejected per item
+        loop = asyncio.get_event_loop()
+        jobs = [item for item, _ in assignments]
+        submitted = await loop.run_in_executor(None, broker_client.submit_many, jobs, os.getpid())
+        overflow = {item["id"] for item in jobs[submitted:]}
+        for entry in results:
+            inflight_requests.pop(entry.get("request_id"), None)
+            if entry.get("request_id") in overflow:
+                entry.update(status="rejected", reason="shared job queue is full")
+                del entry["request_id"]
+        assignments = assignments[:submitted]
+    elif assignments:
+        # Record before enqueueing so the insert always precedes any status update
+        request_tracker.record_queued_many(db_rows)
+        if DURABLE_QUEUE:
+            await wait_for_commit()
+        worker_scheduler.put_many(assignments)
+        for item, worker_id in assignments:
+            trace = item.get("_trace")
+            if trace is not None:
+                trace.instant("routed", worker_id=worker_id)
+    
+    accepted = len(assignments)
+    admission.admitted += accepted
+    requests_received.labels("process_batch").inc(accepted)
+    log.event("batch_accepted", INFO, accepted=accepted, submitted=len(items))
+    
+    if retry_after:
+        response.headers["Retry-After"] = str(retry_after)
+    
+    return {
+        "status": "accepted" if accepted == len(items) else ("partial" if accepted else "rejected"),
+        "accepted": accepted,
+        "rejected": len(items) - accepted,
+        "items": results,
+        "total_queued": sum(projected),
+        "max_capacity": MAX_QUEUE_SIZE * MAX_WORKERS,
+        "timestamp": now
     }
 
 @app.get("/status/{request_id}")
 async def get_status(request_id: str):
     """Get the processing status and results for a specific request"""
-    if request_id in processed_results:
+    status = await lookup_status(request_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown request id: {request_id}")
+    return status
+
+async def lookup_status(request_id: str) -> Optional[Dict]:
+    """The /status answer for a request id, or None if it was never recorded"""
+    # 1. Recent results are served from the in-memory store
+    result = processed_results.get(request_id)
+    if result is not None:
         return {
             "request_id": request_id,
-            "status": "completed",
-            "result": processed_results[request_id]
+            "status": result.get("status", "completed"),
+            "result": result
         }
-    else:
-        # Check if it's still in any worker queue
+    
+    # 1b. Scale-out mode: the broker holds the shared result index and in-flight states
+    if SCALE_OUT_MODE:
+        loop = asyncio.get_event_loop()
+        shared = await loop.run_in_executor(None, broker_client.lookup, request_id)
+        if shared is not None:
+            return dict(shared, request_id=request_id, source="broker")
+    
+    # 2. Requests that are still queued or running
+    state = inflight_requests.get(request_id)
+    if state is not None:
         total_queue_size = sum(q.qsize() for q in worker_queues)
         return {
             "request_id": request_id,
-            "status": "processing",
+            "status": state,
             "total_queue_size": total_queue_size,
             "message": "Request is still being processed or in queue"
         }
+    
+    # 3. Evicted / older results come from the requests table (off the event loop)
+    loop = asyncio.get_event_loop()
+    row = await loop.run_in_executor(None, request_tracker.fetch_request, request_id)
+    source = "database"
+    if row is None:
+        # 4. Past RETENTION_DAYS the row lives in that day's archive partition
+        row = await loop.run_in_executor(None, retention_manager.lookup, request_id)
+        source = "archive"
+    if row is None:
+        return None
+    
+    response = {
+        "request_id": request_id,
+        "status": row["status"],
+        "source": source
+    }
+    if row["status"] == "completed":
+        response["result"] = {
+            "request_id": request_id,
+            "original_text": row.get("text"),
+            "step1_result": row.get("step1_result"),
+            "step2_result": row.get("step2_result"),
+            "final_result": row.get("final_result"),
+            "processing_time": row.get("processing_time"),
+            "worker_id": row.get("worker_id"),
+            "thread_id": row.get("thread_id"),
+            "timestamp": row.get("completed_at"),
+            "status": "completed"
+        }
+    elif row.get("error_message"):
+        response["error_message"] = row["error_message"]
+    return response
+
+async def subscribe_results(ids, client):
+    """Subscribe to the given ids (or to all of ``client``'s requests) and pre-fill results that already finished.
+
+    Ids that are no longer in memory are looked up like /status does (DB, then archive);
+    unknown ids get a terminal "not_found" item so an id-list stream always ends.
+    """
+    request_ids = [i for i in ids if i] if ids else None
+    # Subscribe first, so a result published while we look things up is not missed
+    subscriber = result_hub.subscribe(request_ids, None if request_ids else client)
+    for request_id in request_ids or ():
+        result = processed_results.get(request_id)
+        if result is None and request_id not in inflight_requests:
+            status = await lookup_status(request_id)
+            if status is None:
+                result = {"request_id": request_id, "status": "not_found"}
+            elif status["status"] in rollups.TERMINAL_STATUSES:
+                result = status.get("result") or {
+                    key: status[key] for key in ("request_id", "status", "error_message") if key in status
+                }
+        if result is not None:
+            result_hub.resolve(subscriber, request_id, result)
+    return subscriber
+
+@app.get("/results/stream")
+async def stream_results(request: Request, ids: str = ""):
+    """Server-Sent Events: one `result` event per finished request.
+    
+    ?ids=a,b,c streams those requests and ends once all have finished;
+    without ids the stream carries every request this client submits.
+    """
+    if SCALE_OUT_MODE:
+        # Results are published inside the executor processes, never on this one
+        raise HTTPException(status_code=501, detail="Result streaming is not available in SCALE_OUT_MODE; poll /status/{id}")
+    subscriber = await subscribe_results(ids.split(","), client_key(request))
+    
+    async def events():
+        try:
+            while not subscriber.finished:
+                batch = await subscriber.next_batch(RESULT_STREAM_HEARTBEAT)
+                if not batch:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(
+                    f"id: {result.get('request_id')}\nevent: result\ndata: {json.dumps(result, default=str)}\n\n"
+                    for result in batch
+                )
+            yield "event: end\ndata: {}\n\n"
+        finally:
+            result_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/results/ws")
+async def results_websocket(websocket: WebSocket):
+    """WebSocket variant: send {"ids": [...]} (or {} for all of this client's requests), receive results as JSON"""
+    await websocket.accept()
+    if SCALE_OUT_MODE:
+        await websocket.close(code=1011, reason="Result streaming is not available in SCALE_OUT_MODE")
+        return
+    subscriber = None
+    disconnected = None
+    try:
+        message = await websocket.receive_json()
+        subscriber = await subscribe_results(message.get("ids"), client_key(websocket))
+        # Nothing else is expected from the client; this only completes when it goes away
+        disconnected = asyncio.ensure_future(websocket.receive())
+        while not subscriber.finished and not disconnected.done():
+            batch = await subscriber.next_batch(RESULT_STREAM_HEARTBEAT)
+            for result in batch:
+                await websocket.send_json(result)
+        if not disconnected.done():
+            await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if disconnected is not None:
+            disconnected.cancel()
+        if subscriber is not None:
+            result_hub.unsubscribe(subscriber)
+
+@app.get("/metrics")
+async def get_metrics(format: str = "prometheus"):
+    """In-memory metrics: Prometheus text by default, p50/p95/p99 JSON with ?format=json"""
+    if format == "json":
+        return {
+            "latency": metrics.latency_summary(),
+            "timestamp": datetime.now().isoformat()
+        }
+    return PlainTextResponse(metrics.expose(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/trace/{request_id}")
+async def get_trace(request_id: str, format: str = "json"):
+    """Lifecycle spans of one request; ?format=chrome for chrome://tracing / Perfetto"""
+    trace = tracer.get(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"No trace for {request_id} (not sampled or already overwritten)")
+    return chrome_trace([trace]) if format == "chrome" else trace.to_dict()
+
+@app.get("/debug/slowest")
+async def get_slowest(limit: int = 20, format: str = "json"):
+    """Slowest finished requests still in the trace buffer, with a per-span breakdown"""
+    traces = tracer.slowest(max(1, min(limit, 1000)))
+    if format == "chrome":
+        return chrome_trace(traces)
+    return {
+        "tracer": tracer.stats(),
+        "slowest": [
+            {
+                "request_id": trace.request_id,
+                "duration_seconds": trace.duration,
+                "status": trace.attrs.get("status"),
+                "breakdown": trace.breakdown(),
+            }
+            for trace in traces
+        ],
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/debug/profile")
+async def get_profile(seconds: float = 5, format: str = "json", include_idle: bool = False, top: int = 50):
+    """Sample every thread's stack for ``seconds``; ?format=collapsed returns flamegraph input"""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+    loop = asyncio.get_event_loop()
+    try:
+        profile = await loop.run_in_executor(None, profiler.run, seconds, include_idle)
+    except ProfileBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    stacks = profile.pop("stacks")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed(stacks))
+    profile["distinct_stacks"] = len(stacks)
+    profile["top_stacks"] = [{"stack": stack, "samples": count} for stack, count in stacks.most_common(top)]
+    profile["timestamp"] = datetime.now().isoformat()
+    return profile
 
 @app.get("/queue-status")
 async def get_queue_status():
@@ -404,71 +1223,98 @@ async def get_queue_status():
     active_threads = sum(len(pool._threads) for pool in worker_thread_pools.values())
     worker_queue_sizes = [q.qsize() for q in worker_queues]
     
-    # Save metrics to database
-    save_queue_metrics()
+    depth_by_priority = {}
+    for q in worker_queues:
+        for name, depth in q.depth_by_priority().items():
+            depth_by_priority[name] = depth_by_priority.get(name, 0) + depth
     
-    return {
+    status = {
         "total_queue_size": sum(worker_queue_sizes),
         "worker_queue_sizes": worker_queue_sizes,
         "active_workers": MAX_WORKERS,
         "threads_per_worker": THREADS_PER_WORKER,
+        "requests_per_worker": REQUESTS_PER_WORKER,
         "max_concurrent_requests": MAX_CONCURRENT_REQUESTS,
         "active_threads": active_threads,
-        "processed_requests": len(processed_results),
+        "processed_requests": processed_results.total_stored,
+        "inflight_requests": len(inflight_requests),
+        "result_store": processed_results.stats(),
         "max_queue_size_per_worker": MAX_QUEUE_SIZE,
         "total_max_capacity": MAX_QUEUE_SIZE * MAX_WORKERS,
+        "scheduler": worker_scheduler.stats(),
+        "queue_depth_by_priority": depth_by_priority,
+        "tenants": tenant_stats.snapshot(),
+        "admission": admission.stats(sum(worker_queue_sizes)),
+        "event_log": log.stats(),
+        "queue_sampler": queue_sampler.stats(),
+        "thread_pools": pool_autoscaler.stats() if AUTOSCALE_POOLS else None,
+        "result_stream": result_hub.stats(),
+        "memo": memo.stats(),
+        "retries": {
+            "policy": retry_policy.describe(),
+            "budget": retry_budget.stats(),
+            "circuit_breakers": {name: breaker.stats() for name, breaker in stage_breakers.items()},
+        },
+        "pipeline": PIPELINE.describe(),
+        "timestamp": datetime.now().isoformat()
+    }
+    
+    if SCALE_OUT_MODE:
+        # Aggregate across every API and executor process via the broker
+        loop = asyncio.get_event_loop()
+        shared = await loop.run_in_executor(None, broker_client.stats)
+        executors = shared["executor_processes"].values()
+        status.update(
+            total_queue_size=shared["shared_queue_size"],
+            total_max_capacity=shared["max_queue_size"],
+            active_workers=len(shared["executor_processes"]),
+            active_threads=sum(e.get("active", 0) for e in executors),
+            processed_requests=sum(e.get("completed", 0) + e.get("failed", 0) for e in executors),
+            inflight_requests=shared["inflight_requests"],
+            scale_out=shared
+        )
+    return status
+
+@app.get("/queue-status/history")
+async def get_queue_history(seconds: float = 300, step: float = None):
+    """Sampled queue depths, active threads and throughput, averaged into ``step``-second points"""
+    if seconds <= 0 or (step is not None and step <= 0):
+        raise HTTPException(status_code=422, detail="seconds and step must be positive")
+    # At most ~1000 points per response
+    step = max(step or QUEUE_SAMPLE_INTERVAL, seconds / 1000)
+    return {
+        "interval": QUEUE_SAMPLE_INTERVAL,
+        "seconds": seconds,
+        "step": step,
+        "points": queue_sampler.history(seconds, step),
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/database/stats")
-async def get_database_stats():
-    """Get comprehensive database statistics"""
+async def get_database_stats(since: str = None, until: str = None):
+    """Database statistics from the rollup tables (constant time in the number of requests).
+    
+    ``since`` / ``until`` (ISO date or time, inclusive, minute resolution) restrict the
+    finished-request stats to a time range and add a per-minute breakdown.
+    """
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Get request counts by status
-        cursor.execute('''
-            SELECT status, COUNT(*) as count 
-            FROM requests 
-            GROUP BY status
-        ''')
-        status_counts = dict(cursor.fetchall())
-        
-        # Get recent queue metrics
-        cursor.execute('''
-            SELECT * FROM queue_metrics 
-            ORDER BY timestamp DESC 
-            LIMIT 10
-        ''')
-        recent_metrics = cursor.fetchall()
-        
-        # Get processing time statistics
-        cursor.execute('''
-            SELECT 
-                AVG(processing_time) as avg_time,
-                MIN(processing_time) as min_time,
-                MAX(processing_time) as max_time,
-                COUNT(*) as total_completed
-            FROM requests 
-            WHERE status = 'completed'
-        ''')
-        time_stats = cursor.fetchone()
-        
-        conn.close()
-        
-        return {
-            "request_status_counts": status_counts,
-            "recent_queue_metrics": recent_metrics,
-            "processing_time_stats": {
-                "average_time": time_stats[0],
-                "min_time": time_stats[1],
-                "max_time": time_stats[2],
-                "total_completed": time_stats[3]
-            },
-            "database_path": DATABASE_PATH,
-            "timestamp": datetime.now().isoformat()
-        }
+        since = rollups.parse_minute(since) if since else None
+        until = rollups.parse_minute(until) if until else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid time filter: {e}")
+    
+    try:
+        loop = asyncio.get_event_loop()
+        stats = await loop.run_in_executor(None, request_tracker.fetch_stats, since, until)
+        # Rollups still cover archived days; the manifest says where their rows went
+        archives = await loop.run_in_executor(None, retention_manager.summary, since, until)
+        return dict(
+            stats,
+            archives=archives,
+            range={"since": since, "until": until},
+            database_path=DATABASE_PATH,
+            timestamp=datetime.now().isoformat()
+        )
         
     except Exception as e:
         return {"error": str(e)}
@@ -477,32 +1323,87 @@ async def get_database_stats():
 @app.on_event("startup")
 async def startup_event():
     # Initialize database
+    log.start()
     init_database()
+    request_tracker.start()
+    
+    if SCALE_OUT_MODE:
+        global broker_client
+        loop = asyncio.get_event_loop()
+        broker_client = await loop.run_in_executor(None, connect_broker, BROKER_ADDRESS)
+        print(f"🧭 Scale-out mode: API process {os.getpid()} connected to broker at {BROKER_ADDRESS}")
+        return
+    
+    if DURABLE_QUEUE or RESUME_UNFINISHED:
+        await recover_unfinished_requests()
+    
+    # Spawn and warm the process pool before traffic arrives, if any stage needs it
+    if any(stage.backend == BACKEND_PROCESS for stage in PIPELINE.order):
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, process_backend.start)
+        print(f"🧠 Process pool warmed: {process_backend.max_workers} processes in {process_backend.warm_up_seconds:.2f}s")
     
     print(f"🚀 Starting {MAX_WORKERS} workers with {THREADS_PER_WORKER} threads each...")
-    print(f"📊 Total concurrent processing capacity: {MAX_CONCURRENT_REQUESTS} requests")
-    print(f"🔥 This will process {MAX_CONCURRENT_REQUESTS} requests simultaneously!")
+    print(f"📊 Total concurrent processing capacity: {MAX_WORKERS * REQUESTS_PER_WORKER} requests "
+          f"({PIPELINE.width(BACKEND_THREAD)} parallel stages each)")
+    print(f"🔥 This will process {MAX_WORKERS * REQUESTS_PER_WORKER} requests simultaneously!")
     print(f"⚡ Workers will continuously pull requests and submit to thread pools!")
     print(f"🚀 Using separate queues per worker for maximum parallelism!")
-    print(f"🎯 Round-robin distribution across {MAX_WORKERS} workers!")
-    print(f"💾 SQLite database initialized for persistent tracking!")
+    print(f"🎯 {ROUTING_STRATEGY} routing across {MAX_WORKERS} workers with work stealing!")
+    print(f"💾 SQLite database initialized for persistent tracking (write-behind, WAL{', durable queue' if DURABLE_QUEUE else ''})!")
     print(f"🛡️ Queue size limits: {MAX_QUEUE_SIZE} per worker ({MAX_QUEUE_SIZE * MAX_WORKERS} total)")
     
     for i in range(MAX_WORKERS):
-        asyncio.create_task(worker(i))
+        worker_tasks.append(asyncio.create_task(worker(i)))
+    
+    global autoscaler_task, retention_task, sampler_task
+    sampler_task = asyncio.create_task(queue_sampler.run())
+    if RETENTION_DAYS is not None:
+        retention_task = asyncio.create_task(retention_loop())
+    
+    if AUTOSCALE_POOLS:
+        autoscaler_task = asyncio.create_task(pool_autoscaler.run())
+        print(f"📐 Thread pools autoscale between {MIN_THREADS_PER_WORKER} and {THREADS_PER_WORKER} per worker ({MAX_TOTAL_THREADS} total)")
     
     print(f"✅ {MAX_WORKERS} workers started successfully")
 
-# Shutdown event to stop workers
+worker_tasks = []
+
+# Shutdown event: drain instead of killing work
 @app.on_event("shutdown")
 async def shutdown_event():
-    print("🛑 Shutting down workers...")
-    for q in worker_queues:
-        await q.put(None)
+    global draining, drain_deadline
+    # 1. Stop admission
+    draining = True
+    background = [task for task in (autoscaler_task, retention_task, sampler_task) if task is not None]
+    for task in background:
+        task.cancel()
+    # The sampler hands its unflushed snapshots to the tracker as it stops
+    await asyncio.gather(*background, return_exceptions=True)
     
-    # Wait for all workers to finish
-    await asyncio.sleep(2)
-    print("✅ Workers shutdown complete")
+    # 2. Stop dispatching; queued items stay put, in-flight requests get SHUTDOWN_DRAIN_SECONDS
+    print(f"🛑 Draining: waiting up to {SHUTDOWN_DRAIN_SECONDS}s for {len(inflight_requests)} in-flight/queued requests...")
+    worker_scheduler.close(drain=False)
+    started = time.perf_counter()
+    drain_deadline = time.monotonic() + SHUTDOWN_DRAIN_SECONDS
+    if worker_tasks:
+        _, unfinished = await asyncio.wait(worker_tasks, timeout=SHUTDOWN_DRAIN_SECONDS)
+        # 3. Past the deadline: cancel what is still running (thread pools close in the workers,
+        # which cancel their own in-flight tasks at drain_deadline)
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*worker_tasks, return_exceptions=True)
+    still_queued = sum(q.qsize() for q in worker_queues)
+    cut_short = sum(1 for state in inflight_requests.values() if state == 'processing')
+    print(f"✅ Workers shutdown complete in {time.perf_counter() - started:.2f}s "
+          f"({still_queued} queued and {cut_short} interrupted requests left for the next start)")
+    
+    # 4. Flush every pending DB write (including the rows of the requests left behind) before the process exits
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, process_backend.shutdown)
+    await loop.run_in_executor(None, request_tracker.close)
+    print(f"💾 Request tracker flushed ({request_tracker.records_written} records in {request_tracker.batches_committed} batches)")
+    log.close()
 
 if __name__ == "__main__":
     import uvicorn
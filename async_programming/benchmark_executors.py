@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from executors import ThreadBackend, ProcessBackend, AsyncioBackend
+from stages import fun_1, fun_2, fun_1_async, fun_2_async, fun_1_cpu, fun_2_cpu, _burn
+
+# Scaled-down versions of the demo pipeline so a run takes seconds, not hours
+TASKS = 64
+IO_STEP1_SECONDS = 0.02
+IO_STEP2_SECONDS = 0.01
+CPU_STEP1_ITERATIONS = 200_000
+CPU_STEP2_ITERATIONS = 100_000
+THREADS = 64
+
+
+async def fun_1_cpu_async(v, iterations):
+    """CPU-bound work inside a coroutine blocks the event loop (shown for contrast)"""
+    _burn(iterations)
+    return "fun_1"
+
+async def fun_2_cpu_async(v, iterations):
+    _burn(iterations)
+    return "fun_2"
+
+
+async def run_tasks(backend, step1, step2, step1_arg, step2_arg):
+    """Run TASKS two-step pipelines concurrently on one backend, return requests/s"""
+    async def one(i):
+        v = f"bench_{i}"
+        await backend.run(step1, v, step1_arg)
+        await backend.run(step2, v, step2_arg)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(TASKS)))
+    return TASKS / (time.perf_counter() - start)
+
+
+async def main():
+    cpu_count = os.cpu_count() or 1
+    print(f"🧪 Executor backend benchmark: {TASKS} requests per run, {cpu_count} CPUs")
+
+    thread_backend = ThreadBackend(ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="Bench"))
+    process_backend = ProcessBackend(max_workers=cpu_count)
+    process_backend.start()
+    print(f"🧠 Process pool warm-up: {process_backend.warm_up_seconds:.2f}s")
+    asyncio_backend = AsyncioBackend()
+
+    runs = [
+        ("thread", "io", thread_backend, fun_1, fun_2, IO_STEP1_SECONDS, IO_STEP2_SECONDS),
+        ("process", "io", process_backend, fun_1, fun_2, IO_STEP1_SECONDS, IO_STEP2_SECONDS),
+        ("asyncio", "io", asyncio_backend, fun_1_async, fun_2_async, IO_STEP1_SECONDS, IO_STEP2_SECONDS),
+        ("thread", "cpu", thread_backend, fun_1_cpu, fun_2_cpu, CPU_STEP1_ITERATIONS, CPU_STEP2_ITERATIONS),
+        ("process", "cpu", process_backend, fun_1_cpu, fun_2_cpu, CPU_STEP1_ITERATIONS, CPU_STEP2_ITERATIONS),
+        ("asyncio", "cpu", asyncio_backend, fun_1_cpu_async, fun_2_cpu_async, CPU_STEP1_ITERATIONS, CPU_STEP2_ITERATIONS),
+    ]
+
+    print(f"\n{'backend':<10}{'workload':<10}{'req/s':>10}")
+    print("-" * 30)
+    try:
+        for name, workload, backend, step1, step2, arg1, arg2 in runs:
+            throughput = await run_tasks(backend, step1, step2, arg1, arg2)
+            print(f"{name:<10}{workload:<10}{throughput:>10.1f}")
+    finally:
+        thread_backend.shutdown()
+        process_backend.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Dict
+
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from schemas import ProcessRequest, encode, json_response, orjson
+
+# Per-request CPU cost of /process request decoding and response encoding, before and after
+# the typed fast path. Only the codec / framework work is measured, not admission or queueing.
+ITERATIONS = 20000
+BODY = json.dumps({"text": "test_request_42", "priority": "high", "deadline_seconds": 30}).encode()
+
+
+def full_response(request_id: str) -> Dict:
+    return {
+        "status": "accepted",
+        "request_id": request_id,
+        "message": "Request queued for processing",
+        "worker_assigned": 1,
+        "priority": 0,
+        "tenant": "127.0.0.1",
+        "deadline_seconds": 30,
+        "total_queued": 1234,
+        "max_capacity": 400000,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def cpu_us(func, iterations: int = ITERATIONS) -> float:
+    """CPU microseconds per call"""
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+async def cpu_us_async(func, iterations: int = ITERATIONS) -> float:
+    start = time.process_time()
+    for _ in range(iterations):
+        await func()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def build_app() -> FastAPI:
+    """The old untyped endpoint next to the typed one, minus the queueing logic"""
+    app = FastAPI()
+
+    @app.post("/untyped")
+    async def untyped(data: Dict):
+        data["id"] = str(uuid.uuid4())
+        return full_response(data["id"])
+
+    @app.post("/typed")
+    async def typed(request: Request, ack: str = "full"):
+        ProcessRequest.model_validate_json(await request.body())
+        request_id = str(uuid.uuid4())
+        if ack == "minimal":
+            return json_response({"status": "accepted", "request_id": request_id})
+        return json_response(full_response(request_id))
+
+    return app
+
+
+def asgi_call(app: FastAPI, path: str, query: bytes = b""):
+    """One POST straight through the ASGI app, no HTTP client or socket in the way"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query, "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(BODY)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8001),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": BODY, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"{path} returned {message['status']}")
+
+    return lambda: app(scope, receive, send)
+
+
+async def main():
+    print(f"🧪 /process codec benchmark: {ITERATIONS} iterations, encoder: {'orjson' if orjson else 'pydantic_core'}")
+    dict_adapter = TypeAdapter(Dict)
+    response = full_response(str(uuid.uuid4()))
+
+    codec = [
+        ("decode", "json.loads + Dict validation", lambda: dict_adapter.validate_python(json.loads(BODY))),
+        ("decode", "ProcessRequest.model_validate_json", lambda: ProcessRequest.model_validate_json(BODY)),
+        ("encode", "jsonable_encoder + json.dumps", lambda: json.dumps(
+            jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")).encode()),
+        ("encode", "encode(full)", lambda: encode(response)),
+        ("encode", "encode(minimal)", lambda: encode({"status": "accepted", "request_id": response["request_id"]})),
+        ("encode", "datetime.now().isoformat()", lambda: datetime.now().isoformat()),
+    ]
+    print(f"\n{'step':<8}{'implementation':<40}{'µs/req':>10}")
+    print("-" * 58)
+    for step, name, func in codec:
+        print(f"{step:<8}{name:<40}{cpu_us(func):>10.2f}")
+
+    app = build_app()
+    endpoints = [
+        ("before", "Dict body, dict response", asgi_call(app, "/untyped")),
+        ("after", "typed body, full ack", asgi_call(app, "/typed")),
+        ("after", "typed body, minimal ack", asgi_call(app, "/typed", b"ack=minimal")),
+    ]
+    print(f"\n{'':<8}{'endpoint (through the ASGI app)':<40}{'µs/req':>10}")
+    print("-" * 58)
+    for _, _, call in endpoints:
+        await cpu_us_async(call, 1000)  # Warm-up
+    for label, name, call in endpoints:
+        print(f"{label:<8}{name:<40}{await cpu_us_async(call):>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,187 @@
+import argparse
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional
+
+from result_store import ResultStore
+
+BROKER_ADDRESS = "/tmp/async_queue_broker.sock"
+BROKER_AUTHKEY = b"async-queue-broker"
+
+
+class JobBroker:
+    """Shared job queue and result index for the scale-out mode.
+
+    Lives in the broker process and is reached from API and executor
+    processes through a Unix-socket manager proxy. The manager serves each
+    client connection on its own thread, hence the lock.
+    """
+
+    def __init__(self, max_queue_size: int = 400000, result_capacity: int = 100000, result_ttl: float = 3600):
+        self._jobs = queue.Queue(maxsize=max_queue_size)
+        self._results = ResultStore(capacity=result_capacity, ttl_seconds=result_ttl)
+        self._states: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._producers: Dict[int, Dict] = {}
+        self._consumers: Dict[int, Dict] = {}
+        self.max_queue_size = max_queue_size
+        self.started_at = time.time()
+
+    # ------------------------------------------------------------------
+    # API processes
+    # ------------------------------------------------------------------
+    def submit(self, job: Dict, producer_pid: int) -> bool:
+        return self.submit_many([job], producer_pid) == 1
+
+    def submit_many(self, jobs: List[Dict], producer_pid: int) -> int:
+        """Enqueue jobs until the shared queue is full; returns how many were accepted"""
+        accepted = 0
+        for job in jobs:
+            try:
+                self._jobs.put_nowait(job)
+            except queue.Full:
+                break
+            with self._lock:
+                self._states[job["id"]] = "queued"
+            accepted += 1
+        with self._lock:
+            producer = self._producers.setdefault(producer_pid, {"submitted": 0, "rejected": 0})
+            producer["submitted"] += accepted
+            producer["rejected"] += len(jobs) - accepted
+        return accepted
+
+    def lookup(self, request_id: str) -> Optional[Dict]:
+        """Status of a request the broker knows about (None = ask the database)"""
+        with self._lock:
+            result = self._results.get(request_id)
+            if result is not None:
+                return {"status": result.get("status", "completed"), "result": result}
+            state = self._states.get(request_id)
+        if state is not None:
+            return {"status": state}
+        return None
+
+    # ------------------------------------------------------------------
+    # Executor processes
+    # ------------------------------------------------------------------
+    def take(self, max_items: int, timeout: float, consumer_pid: int) -> List[Dict]:
+        """Wait up to ``timeout`` for one job, then grab up to ``max_items`` without waiting"""
+        jobs = []
+        try:
+            jobs.append(self._jobs.get(timeout=timeout))
+            while len(jobs) < max_items:
+                jobs.append(self._jobs.get_nowait())
+        except queue.Empty:
+            pass
+        if jobs:
+            with self._lock:
+                for job in jobs:
+                    self._states[job["id"]] = "processing"
+                consumer = self._consumers.setdefault(consumer_pid, {})
+                consumer["taken"] = consumer.get("taken", 0) + len(jobs)
+        return jobs
+
+    def complete(self, request_id: str, result: Dict):
+        with self._lock:
+            self._results.put(request_id, result)
+            self._states.pop(request_id, None)
+
+    def report(self, consumer_pid: int, stats: Dict):
+        """Executors push their local stats so /queue-status can aggregate them"""
+        with self._lock:
+            consumer = self._consumers.setdefault(consumer_pid, {})
+            consumer.update(stats)
+            consumer["reported_at"] = time.time()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "shared_queue_size": self._jobs.qsize(),
+                "max_queue_size": self.max_queue_size,
+                "inflight_requests": len(self._states),
+                "result_index": self._results.stats(),
+                "api_processes": {str(pid): dict(p) for pid, p in self._producers.items()},
+                "executor_processes": {str(pid): dict(c) for pid, c in self._consumers.items()},
+                "uptime_seconds": time.time() - self.started_at,
+            }
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+def connect(address: str = BROKER_ADDRESS, authkey: bytes = BROKER_AUTHKEY, wait: float = 10.0):
+    """Return a proxy to the broker's JobBroker, retrying while the broker starts up"""
+    class _Client(BaseManager):
+        pass
+
+    _Client.register("get_broker")
+    deadline = time.monotonic() + wait
+    while True:
+        client = _Client(address=address, authkey=authkey)
+        try:
+            client.connect()
+            return client.get_broker()
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.1)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(address: str, executors: int, threads: int, max_queue_size: int):
+    """Run the broker and its executor processes until interrupted"""
+    from executor_node import main as executor_main
+
+    if os.path.exists(address):
+        os.unlink(address)
+
+    broker = JobBroker(max_queue_size=max_queue_size)
+    BrokerManager.register("get_broker", callable=lambda: broker)
+    server = BrokerManager(address=address, authkey=BROKER_AUTHKEY).get_server()
+
+    # Spawn (not fork) so executors don't inherit the broker's server threads
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=executor_main, args=(address, node_id, threads),
+                    name=f"Executor-{node_id}", daemon=True)
+        for node_id in range(executors)
+    ]
+    for process in processes:
+        process.start()
+
+    # Treat SIGTERM like Ctrl+C so the executors are stopped before the socket goes away
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+    print(f"🧭 Broker listening on {address} with {executors} executor processes × {threads} threads")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        print("🛑 Broker stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared job queue broker for running app.py with uvicorn --workers N")
+    parser.add_argument('--address', default=BROKER_ADDRESS, help="Unix socket path")
+    parser.add_argument('--executors', type=int, default=os.cpu_count() or 1, help="Executor processes to start")
+    parser.add_argument('--threads', type=int, default=250, help="Pipeline threads per executor process")
+    parser.add_argument('--max-queue-size', type=int, default=400000, help="Capacity of the shared job queue")
+    args = parser.parse_args()
+    serve(args.address, args.executors, args.threads, args.max_queue_size)
+
+
+if __name__ == "__main__":
+    main()
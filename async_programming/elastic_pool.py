@@ -0,0 +1,239 @@
+import asyncio
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, Optional
+
+_SHUTDOWN = None
+
+
+class ElasticThreadPool(Executor):
+    """Thread pool whose size follows a ``target`` set from outside.
+
+    Threads are started only when work is waiting and the pool is below its
+    target. Threads above the target retire once they are idle for
+    ``idle_timeout`` seconds, so shrinking never interrupts a running task.
+    Drop-in for ``ThreadPoolExecutor`` with ``loop.run_in_executor``.
+    """
+
+    def __init__(self, min_threads: int = 1, max_threads: int = 1000, thread_name_prefix: str = "Elastic",
+                 idle_timeout: float = 1.0, alpha: float = 0.2):
+        self.min_threads = min_threads
+        self.max_threads = max_threads
+        self.thread_name_prefix = thread_name_prefix
+        self.idle_timeout = idle_timeout
+        self.alpha = alpha
+        self.target = min_threads
+        self._work = queue.SimpleQueue()
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._idle = 0
+        self._pending = 0
+        self._shutdown = False
+        self._counter = 0
+
+        # Statistics
+        self.submitted = 0
+        self.completed = 0
+        self.avg_task_seconds: Optional[float] = None  # EWMA of observed task (stage) latency
+
+    # ------------------------------------------------------------------
+    # Executor interface
+    # ------------------------------------------------------------------
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self.submitted += 1
+            self._pending += 1
+            self._work.put((future, fn, args, kwargs))
+            if self._idle < self._pending and len(self._threads) < self.target:
+                self._spawn()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+            if cancel_futures:
+                self._cancel_pending()
+            for _ in threads:
+                self._work.put(_SHUTDOWN)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _cancel_pending(self):
+        while True:
+            try:
+                item = self._work.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _SHUTDOWN:
+                item[0].cancel()
+                self._pending -= 1
+
+    # ------------------------------------------------------------------
+    # Sizing
+    # ------------------------------------------------------------------
+    def resize(self, target: int) -> int:
+        """Set the desired thread count (clamped to [min_threads, max_threads]); returns the new target"""
+        target = max(self.min_threads, min(self.max_threads, target))
+        with self._lock:
+            if self._shutdown:
+                return self.target
+            self.target = target
+            # Growing: start threads right away for work that is already waiting
+            missing = min(target - len(self._threads), self._pending - self._idle)
+            for _ in range(max(0, missing)):
+                self._spawn()
+        return target
+
+    def _spawn(self):
+        """Start one worker thread (caller holds the lock)"""
+        self._counter += 1
+        thread = threading.Thread(target=self._run, name=f"{self.thread_name_prefix}_{self._counter}", daemon=True)
+        self._threads.add(thread)
+        self._idle += 1
+        thread.start()
+
+    def _run(self):
+        thread = threading.current_thread()
+        while True:
+            try:
+                item = self._work.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if len(self._threads) > self.target:
+                        self._retire(thread)
+                        return
+                continue
+            if item is _SHUTDOWN:
+                with self._lock:
+                    self._retire(thread)
+                return
+
+            future, fn, args, kwargs = item
+            with self._lock:
+                self._idle -= 1
+                self._pending -= 1
+            if future.set_running_or_notify_cancel():
+                started = time.perf_counter()
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+                elapsed = time.perf_counter() - started
+                self.avg_task_seconds = elapsed if self.avg_task_seconds is None else (
+                    self.alpha * elapsed + (1 - self.alpha) * self.avg_task_seconds)
+            del future, fn, args, kwargs, item
+            with self._lock:
+                self.completed += 1
+                self._idle += 1
+
+    def _retire(self, thread: threading.Thread):
+        self._threads.discard(thread)
+        self._idle -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            live, idle, pending = len(self._threads), self._idle, self._pending
+        return {
+            "threads": live,
+            "target": self.target,
+            "busy": live - idle,
+            "idle": idle,
+            "waiting_tasks": pending,
+            "min_threads": self.min_threads,
+            "max_threads": self.max_threads,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "avg_task_seconds": self.avg_task_seconds,
+        }
+
+
+class PoolAutoscaler:
+    """Resizes every worker's ElasticThreadPool from queue depth and stage latency.
+
+    Per pool, each tick sizes for the larger of
+      * Little's law: task arrival rate x average task latency, and
+      * what is busy or waiting right now,
+    plus one thread per request still sitting in the worker's queue. Growth is
+    immediate, shrinking is at most ``shrink_factor`` per tick, and when the
+    sum over all pools would exceed ``max_total_threads`` every target is
+    scaled down proportionally.
+    """
+
+    def __init__(self, pools: Dict[int, ElasticThreadPool], queue_depth: Callable[[int], int], max_total_threads: int,
+                 interval: float = 0.5, shrink_factor: float = 0.5,
+                 on_scale: Optional[Callable[[int, int, int, Dict], None]] = None):
+        self.pools = pools
+        self.queue_depth = queue_depth
+        self.max_total_threads = max_total_threads
+        self.interval = interval
+        self.shrink_factor = shrink_factor
+        # Called with (worker_id, old_target, new_target, inputs) on every change
+        self.on_scale = on_scale
+        self._last_submitted: Dict[int, int] = {}
+        self._last_tick = None
+        self._inputs: Dict[int, Dict] = {}
+        self.scale_events = 0
+
+    def desired(self, worker_id: int, pool: ElasticThreadPool, elapsed: float) -> int:
+        stats = pool.stats()
+        submitted = stats["submitted"]
+        rate = (submitted - self._last_submitted.get(worker_id, submitted)) / elapsed if elapsed else 0.0
+        self._last_submitted[worker_id] = submitted
+        latency = pool.avg_task_seconds or 0.0
+        queued = self.queue_depth(worker_id)
+        littles = rate * latency
+        needed = math.ceil(max(littles, stats["busy"] + stats["waiting_tasks"])) + queued
+        self._inputs[worker_id] = {
+            "arrival_rate": rate,
+            "avg_task_seconds": latency,
+            "queue_depth": queued,
+            "littles_law_threads": littles,
+        }
+        # Shrink gradually so a short lull doesn't throw away threads we need again next tick
+        floor = int(pool.target * self.shrink_factor)
+        return max(needed, floor)
+
+    def tick(self):
+        now = time.monotonic()
+        elapsed = now - self._last_tick if self._last_tick is not None else 0.0
+        self._last_tick = now
+        targets = {worker_id: self.desired(worker_id, pool, elapsed) for worker_id, pool in list(self.pools.items())}
+        targets = {worker_id: max(self.pools[worker_id].min_threads, min(self.pools[worker_id].max_threads, t))
+                   for worker_id, t in targets.items()}
+        total = sum(targets.values())
+        if total > self.max_total_threads:
+            scale = self.max_total_threads / total
+            targets = {worker_id: int(t * scale) for worker_id, t in targets.items()}
+        for worker_id, target in targets.items():
+            pool = self.pools[worker_id]
+            old = pool.target
+            new = pool.resize(target)
+            if new != old:
+                self.scale_events += 1
+                if self.on_scale is not None:
+                    self.on_scale(worker_id, old, new, self._inputs.get(worker_id, {}))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.tick()
+
+    def stats(self) -> Dict:
+        pools = {}
+        for worker_id, pool in sorted(self.pools.items()):
+            pools[str(worker_id)] = dict(pool.stats(), **self._inputs.get(worker_id, {}))
+        return {
+            "max_total_threads": self.max_total_threads,
+            "total_threads": sum(p["threads"] for p in pools.values()),
+            "total_target": sum(p["target"] for p in pools.values()),
+            "scale_events": self.scale_events,
+            "pools": pools,
+        }
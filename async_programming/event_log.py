@@ -0,0 +1,130 @@
+import atexit
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, TextIO
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
+FORMAT_TEXT = "text"
+FORMAT_JSON = "json"
+
+
+class EventLogger:
+    """Structured event log that keeps formatting and I/O off the hot path.
+
+    ``log.event(...)`` only checks the level, applies per-event sampling and
+    appends a compact tuple to a bounded buffer. A background thread formats
+    the records (text or JSON lines) and writes them in batches.
+    """
+
+    def __init__(self, level: str = "INFO", fmt: str = FORMAT_TEXT, sample_rates: Optional[Dict[str, float]] = None,
+                 stream: TextIO = None, buffer_size: int = 100000, flush_interval: float = 0.2):
+        if fmt not in (FORMAT_TEXT, FORMAT_JSON):
+            raise ValueError(f"Unknown log format: {fmt}")
+        self.level = LEVELS[level.upper()]
+        self.fmt = fmt
+        self.sample_rates = dict(sample_rates or {})
+        self.stream = stream or sys.stdout
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = deque()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.emitted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------------
+    # Hot path
+    # ------------------------------------------------------------------
+    def event(self, name: str, level: int = INFO, **fields):
+        if level < self.level:
+            return
+        rate = self.sample_rates.get(name)
+        if rate is not None and random.random() >= rate:
+            self.sampled_out += 1
+            return
+        if len(self._buffer) >= self.buffer_size:
+            # Never block the caller on a slow log sink
+            self.dropped += 1
+            return
+        self._buffer.append((time.time(), level, name, fields))
+
+    def enabled(self, name: str, level: int = INFO) -> bool:
+        """Cheap pre-check for callers that would otherwise build expensive fields"""
+        return level >= self.level and self.sample_rates.get(name, 1.0) > 0
+
+    # ------------------------------------------------------------------
+    # Background writer
+    # ------------------------------------------------------------------
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="EventLog-Writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def close(self):
+        """Write everything still buffered and stop the writer"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self):
+        lines = []
+        buffer = self._buffer
+        while buffer:
+            lines.append(self._format(*buffer.popleft()))
+        if lines:
+            self.emitted += len(lines)
+            try:
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+            except Exception:
+                pass
+
+    def _format(self, timestamp: float, level: int, name: str, fields: Dict) -> str:
+        if self.fmt == FORMAT_JSON:
+            record = {"ts": timestamp, "level": LEVEL_NAMES[level], "event": name}
+            record.update(fields)
+            return json.dumps(record, default=str)
+        when = datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds")
+        pairs = " ".join(f"{key}={value}" for key, value in fields.items())
+        return f"{when} {LEVEL_NAMES[level]:<7} {name} {pairs}".rstrip()
+
+    def stats(self) -> Dict:
+        return {
+            "level": LEVEL_NAMES[self.level],
+            "format": self.fmt,
+            "sample_rates": self.sample_rates,
+            "buffered": len(self._buffer),
+            "emitted": self.emitted,
+            "sampled_out": self.sampled_out,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from broker import connect, BROKER_AUTHKEY
+
+REPORT_INTERVAL = 1.0  # Seconds between stats pushes to the broker
+TAKE_BATCH = 256  # Max jobs pulled from the broker per round trip
+TAKE_TIMEOUT = 0.5  # Seconds a take() waits for the first job
+
+
+def main(address: str, node_id: int, threads: int, authkey: bytes = BROKER_AUTHKEY):
+    """Entry point of one executor process in scale-out mode"""
+    # Imported here so the pipeline, tracker and event log are this process's own copies
+    import app
+
+    broker = connect(address, authkey)
+    app.log.start()
+    app.init_database()
+    app.request_tracker.start()
+    try:
+        asyncio.run(consume(app, broker, node_id, threads))
+    except KeyboardInterrupt:
+        pass
+    except (EOFError, ConnectionError):
+        print(f"⚠️ Executor {node_id}: lost connection to the broker, stopping")
+    finally:
+        app.request_tracker.close()
+        app.log.close()
+
+
+async def consume(app, broker, node_id: int, threads: int):
+    """Pull jobs from the shared queue and run them through the app's pipeline"""
+    from executors import ThreadBackend, BACKEND_THREAD
+
+    loop = asyncio.get_running_loop()
+    pid = os.getpid()
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"Executor-{node_id}")
+    # Each job can hold a thread per parallel stage; only take as many as the pool runs side by
+    # side, so the rest stay in the shared queue where other executors can take them
+    capacity = max(1, threads // max(1, app.PIPELINE.width(BACKEND_THREAD)))
+    app.worker_thread_pools[node_id] = pool
+    app.worker_thread_backends[node_id] = ThreadBackend(pool)
+
+    # Separate single threads so take() long-polls never delay completions
+    fetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"Executor-{node_id}-take")
+    reporter = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"Executor-{node_id}-report")
+
+    active = set()
+    completed = 0
+    failed = 0
+    last_report = 0.0
+    print(f"🚀 Executor {node_id} (pid {pid}) started with {threads} threads ({capacity} concurrent jobs)")
+
+    async def run_one(job):
+        nonlocal completed, failed
+        # The executor records the row so the insert and its status updates share one writer
+        app.save_request_to_db(job, node_id)
+        result = await app.process_request_in_threadpool(job, node_id, pool)
+        if result is None:
+            failed += 1
+            result = app.processed_results.get(job["id"]) or {"request_id": job["id"], "status": "failed"}
+        else:
+            completed += 1
+        await loop.run_in_executor(reporter, broker.complete, job["id"], result)
+
+    try:
+        while True:
+            now = time.monotonic()
+            if now - last_report >= REPORT_INTERVAL:
+                last_report = now
+                stats = {
+                    "node_id": node_id,
+                    "active": len(active),
+                    "threads": threads,
+                    "capacity": capacity,
+                    "completed": completed,
+                    "failed": failed,
+                    "timestamp": datetime.now().isoformat(),
+                }
+                loop.run_in_executor(reporter, broker.report, pid, stats)
+
+            free = capacity - len(active)
+            if free <= 0:
+                await asyncio.wait(active, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            jobs = await loop.run_in_executor(fetcher, broker.take, min(free, TAKE_BATCH), TAKE_TIMEOUT, pid)
+            taken_at = time.monotonic()
+            for job in jobs:
+                # CLOCK_MONOTONIC is shared by all processes on the box, so the API's stamp is usable
+                job.setdefault("_enqueued_at", taken_at)
+                task = asyncio.create_task(run_one(job))
+                active.add(task)
+                task.add_done_callback(active.discard)
+    finally:
+        if active:
+            await asyncio.gather(*active, return_exceptions=True)
+        pool.shutdown(wait=True)
+        fetcher.shutdown(wait=False)
+        reporter.shutdown(wait=True)
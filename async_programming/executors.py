@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from stages import call_stage, warm_up
+
+BACKEND_THREAD = "thread"
+BACKEND_PROCESS = "process"
+BACKEND_ASYNCIO = "asyncio"
+BACKENDS = (BACKEND_THREAD, BACKEND_PROCESS, BACKEND_ASYNCIO)
+
+
+class ExecutorBackend:
+    """Common interface: ``await backend.run(func, *args)`` -> (value, thread_id, elapsed)"""
+
+    name = None
+
+    async def run(self, func, *args):
+        raise NotImplementedError
+
+    def shutdown(self, wait: bool = True):
+        pass
+
+    def stats(self) -> Dict:
+        return {"backend": self.name}
+
+
+class ThreadBackend(ExecutorBackend):
+    """Blocking I/O: hop onto a ThreadPoolExecutor"""
+
+    name = BACKEND_THREAD
+
+    def __init__(self, executor: ThreadPoolExecutor):
+        self.executor = executor
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, call_stage, func, *args)
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "threads": len(self.executor._threads)}
+
+
+class ProcessBackend(ExecutorBackend):
+    """CPU-bound work: a process pool sidesteps the GIL.
+
+    Stage functions and their arguments must be picklable (module-level
+    functions from ``stages.py``, plain str/int payloads). Uses the "spawn"
+    start method because forking a process that already runs thousands of
+    threads is unsafe.
+    """
+
+    name = BACKEND_PROCESS
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+        self._lock = threading.Lock()
+        self.warm_up_seconds = None
+
+    def start(self, warm: bool = True):
+        """Create the pool and, optionally, start every child process up front"""
+        with self._lock:
+            if self.executor is not None:
+                return
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        if warm:
+            started = time.perf_counter()
+            # One task per child forces the pool to spawn all of them now, not on the first request
+            futures = [self.executor.submit(warm_up) for _ in range(self.max_workers)]
+            for future in futures:
+                future.result()
+            self.warm_up_seconds = time.perf_counter() - started
+
+    async def run(self, func, *args):
+        if self.executor is None:
+            self.start(warm=False)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, call_stage, func, *args)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "processes": self.max_workers, "warm_up_seconds": self.warm_up_seconds}
+
+
+class AsyncioBackend(ExecutorBackend):
+    """Async I/O: await a native coroutine directly on the event loop"""
+
+    name = BACKEND_ASYNCIO
+
+    async def run(self, func, *args):
+        if not asyncio.iscoroutinefunction(func):
+            raise TypeError(f"asyncio backend needs a coroutine function, got {func!r}")
+        start = time.perf_counter()
+        value = await func(*args)
+        return value, threading.get_ident(), time.perf_counter() - start
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Optional, Tuple
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITIES = {"high": PRIORITY_HIGH, "normal": PRIORITY_NORMAL, "low": PRIORITY_LOW}
+PRIORITY_NAMES = {level: name for name, level in PRIORITIES.items()}
+
+DEFAULT_TENANT = "default"
+
+
+def parse_priority(value) -> int:
+    """Accept "high"/"normal"/"low" or 0/1/2; raises ValueError otherwise"""
+    if value is None:
+        return PRIORITY_NORMAL
+    if isinstance(value, str) and value.lower() in PRIORITIES:
+        return PRIORITIES[value.lower()]
+    if isinstance(value, int) and not isinstance(value, bool) and value in PRIORITY_NAMES:
+        return value
+    raise ValueError(f"Unknown priority {value!r}; use one of {list(PRIORITIES)}")
+
+
+class TenantStats:
+    """Per-tenant depth and queue-wait statistics, shared by every FairQueue"""
+
+    def __init__(self, alpha: float = 0.2, max_tenants: int = 10000):
+        self.alpha = alpha
+        self.max_tenants = max_tenants
+        self._tenants: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def _get(self, tenant: str) -> Dict:
+        stats = self._tenants.get(tenant)
+        if stats is None:
+            stats = {"queued": [0] * len(PRIORITY_NAMES), "enqueued": 0, "dequeued": 0,
+                     "avg_wait_seconds": None, "max_wait_seconds": 0.0}
+            while len(self._tenants) >= self.max_tenants and self._evict():
+                pass
+            self._tenants[tenant] = stats
+        else:
+            self._tenants.move_to_end(tenant)
+        return stats
+
+    def _evict(self) -> bool:
+        """Drop the least recently seen tenant with nothing queued; False if there is none.
+
+        Tenants with queued items are kept (their depth would restart at 0 and go
+        negative), so the table can run over max_tenants while they all have work waiting.
+        """
+        for _ in range(len(self._tenants)):
+            tenant, stats = next(iter(self._tenants.items()))
+            if not any(stats["queued"]):
+                del self._tenants[tenant]
+                return True
+            self._tenants.move_to_end(tenant)
+        return False
+
+    def record_enqueue(self, tenant: str, priority: int):
+        stats = self._get(tenant)
+        stats["queued"][priority] += 1
+        stats["enqueued"] += 1
+
+    def record_dequeue(self, tenant: str, priority: int, wait: float):
+        stats = self._get(tenant)
+        stats["queued"][priority] -= 1
+        stats["dequeued"] += 1
+        avg = stats["avg_wait_seconds"]
+        stats["avg_wait_seconds"] = wait if avg is None else self.alpha * wait + (1 - self.alpha) * avg
+        if wait > stats["max_wait_seconds"]:
+            stats["max_wait_seconds"] = wait
+
+    def snapshot(self) -> Dict:
+        return {
+            tenant: {
+                "queue_depth": sum(stats["queued"]),
+                "queue_depth_by_priority": {PRIORITY_NAMES[p]: n for p, n in enumerate(stats["queued"]) if n},
+                "enqueued": stats["enqueued"],
+                "dequeued": stats["dequeued"],
+                "avg_wait_seconds": stats["avg_wait_seconds"],
+                "max_wait_seconds": stats["max_wait_seconds"],
+            }
+            for tenant, stats in self._tenants.items()
+        }
+
+
+class _TenantQueue:
+    __slots__ = ("tenant", "items", "deficit", "quantum")
+
+    def __init__(self, tenant: str, quantum: float):
+        self.tenant = tenant
+        self.items = deque()
+        self.deficit = 0.0
+        self.quantum = quantum
+
+
+class FairQueue:
+    """Drop-in for ``asyncio.Queue`` in the worker scheduler.
+
+    Strict priority between classes (high, normal, low); inside a class,
+    deficit round robin between tenants so one bulk tenant can't starve the
+    rest. Every item costs 1, and a tenant's quantum is its weight (at least
+    1), so both put and get are O(1).
+
+    Like ``asyncio.Queue.put_nowait``, a put on a full queue raises
+    ``asyncio.QueueFull``; ``put`` never waits for room.
+    """
+
+    def __init__(self, maxsize: int = 0, classify: Callable[[Dict], Tuple[int, str]] = None,
+                 weights: Optional[Dict[str, float]] = None, tenant_stats: Optional[TenantStats] = None):
+        self.maxsize = maxsize
+        self.classify = classify or (lambda item: (PRIORITY_NORMAL, DEFAULT_TENANT))
+        self.weights = weights or {}
+        self.tenant_stats = tenant_stats
+        self._size = 0
+        # Per class: tenant -> its queue, plus the round-robin order of tenants with work
+        self._tenants = [dict() for _ in PRIORITY_NAMES]
+        self._active = [deque() for _ in PRIORITY_NAMES]
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self._size
+
+    def put_nowait(self, item: Dict):
+        if self.full():
+            raise asyncio.QueueFull
+        priority, tenant = self.classify(item)
+        tenants = self._tenants[priority]
+        queue = tenants.get(tenant)
+        if queue is None:
+            queue = _TenantQueue(tenant, max(1.0, self.weights.get(tenant, 1.0)))
+            tenants[tenant] = queue
+        if not queue.items:
+            self._active[priority].append(queue)
+        queue.items.append((time.monotonic(), item))
+        self._size += 1
+        if self.tenant_stats is not None:
+            self.tenant_stats.record_enqueue(tenant, priority)
+
+    async def put(self, item: Dict):
+        self.put_nowait(item)
+
+    def get_nowait(self) -> Dict:
+        for priority, active in enumerate(self._active):
+            if active:
+                break
+        else:
+            raise asyncio.QueueEmpty
+        queue = active[0]
+        # A tenant earns its quantum each time it reaches the head of the round
+        if queue.deficit < 1:
+            queue.deficit += queue.quantum
+        enqueued_at, item = queue.items.popleft()
+        queue.deficit -= 1
+        if not queue.items:
+            active.popleft()
+            queue.deficit = 0.0
+            del self._tenants[priority][queue.tenant]
+        elif queue.deficit < 1:
+            active.rotate(-1)
+        self._size -= 1
+        if self.tenant_stats is not None:
+            self.tenant_stats.record_dequeue(queue.tenant, priority, time.monotonic() - enqueued_at)
+        return item
+
+    def depth_by_priority(self) -> Dict[str, int]:
+        return {
+            PRIORITY_NAMES[priority]: sum(len(queue.items) for queue in active)
+            for priority, active in enumerate(self._active)
+        }
@@ -119,6 +119,46 @@ def test_sync_load(total_requests=1000):
     
     return results
 
+async def send_batch_async(session, batch_start, batch_size):
+    """Send one /process/batch request carrying batch_size items"""
+    url = "http://127.0.0.1:8001/process/batch"
+    items = [{"text": f"test_request_{i}"} for i in range(batch_start, batch_start + batch_size)]
+    payload = json.dumps({"items": items})
+    headers = {'Content-Type': 'application/json'}
+    
+    try:
+        async with session.post(url, headers=headers, data=payload) as response:
+            body = await response.json()
+            return {"status": response.status, "accepted": body.get("accepted", 0), "rejected": body.get("rejected", batch_size)}
+    except Exception as e:
+        return {"status": "error", "accepted": 0, "rejected": batch_size, "response": str(e)}
+
+async def test_batch_load(total_requests=10000, batch_size=1000):
+    """Test submitting the same load through /process/batch"""
+    print(f"📦 Starting batch load test with {total_requests} requests in batches of {batch_size}...")
+    
+    start_time = time.perf_counter()
+    
+    async with aiohttp.ClientSession() as session:
+        tasks = [send_batch_async(session, start, min(batch_size, total_requests - start))
+                 for start in range(0, total_requests, batch_size)]
+        results = await asyncio.gather(*tasks)
+    
+    end_time = time.perf_counter()
+    total_duration = end_time - start_time
+    
+    accepted = sum(r["accepted"] for r in results)
+    rejected = sum(r["rejected"] for r in results)
+    
+    print(f"\n📊 Batch Load Test Results:")
+    print(f"Total requests: {total_requests} in {len(results)} HTTP calls")
+    print(f"Accepted: {accepted}")
+    print(f"Rejected: {rejected}")
+    print(f"Total time: {total_duration:.2f} seconds")
+    print(f"Requests per second: {total_requests/total_duration:.2f}")
+    
+    return results
+
 def test_single_request():
     """Test a single request to verify the endpoint works"""
     print("🧪 Testing single request...")
@@ -158,6 +198,10 @@ async def main():
     print("\n" + "="*50)
     await test_async_load(10000)
     
+    # # Test the same load through the batch endpoint
+    # print("\n" + "="*50)
+    # await test_batch_load(10000, 1000)
+    
     # # Test with sync requests using ThreadPoolExecutor
     # print("\n" + "="*50)
     # test_sync_load(100)
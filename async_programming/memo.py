@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import json
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Tuple
+
+SOURCE_MEMORY = "memory"
+SOURCE_DISK = "disk"
+SOURCE_COALESCED = "coalesced"
+SOURCE_COMPUTED = "computed"
+
+
+class ComputationAbandoned(Exception):
+    """The request computing a shared key was cancelled; its waiters take over"""
+
+
+class MemoCache:
+    """Content-addressed memoization of pipeline outputs.
+
+    Keys are a SHA-256 of the pipeline version and the NFC-normalized input,
+    so bumping the version invalidates everything at once. Lookups go to an
+    in-memory LRU first and then to the ``memo_cache`` table through the
+    tracker. Identical requests that arrive while the first one is still
+    running wait on its future instead of computing again. If that run
+    fails or is cancelled, one waiter becomes the new owner and the rest
+    wait on it.
+
+    Only the event loop touches it, so there is no locking.
+    """
+
+    def __init__(self, tracker, version: str, capacity: int = 100000):
+        self.tracker = tracker
+        self.version = version
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # Counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return unicodedata.normalize("NFC", text)
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.version}\0{self.normalize(text)}".encode()).hexdigest()
+
+    def _remember(self, key: str, outputs: Dict):
+        self._entries[key] = outputs
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(self, text: str, compute: Callable[[], Awaitable[Dict]]) -> Tuple[Dict, str]:
+        """Return (stage outputs, source) for ``text``, calling ``compute()`` only on a real miss"""
+        key = self.key(text)
+        while True:
+            outputs = self._entries.get(key)
+            if outputs is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return outputs, SOURCE_MEMORY
+            running = self._inflight.get(key)
+            if running is None:
+                break
+            try:
+                # shield: a cancelled waiter must not cancel the shared computation
+                outputs = await asyncio.shield(running)
+                self.coalesced += 1
+                return outputs, SOURCE_COALESCED
+            except Exception:
+                # The shared run failed for its own reasons (e.g. its deadline) or its owner was
+                # cancelled: look again, so the first waiter back owns the retry and the rest wait on it
+                continue
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            stored = await loop.run_in_executor(None, self.tracker.fetch_memo, key)
+            if stored is not None:
+                outputs, source = json.loads(stored), SOURCE_DISK
+                self.disk_hits += 1
+            else:
+                outputs, source = await compute(), SOURCE_COMPUTED
+                self.misses += 1
+                self.tracker.record_memo(key, self.version, json.dumps(outputs), datetime.now().isoformat())
+            self._remember(key, outputs)
+            future.set_result(outputs)
+            return outputs, source
+        except asyncio.CancelledError:
+            # Waiters get a retryable error instead of our cancellation
+            future.set_exception(ComputationAbandoned(key))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved here so a future nobody waited on doesn't log a warning
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.coalesced + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "in_flight": len(self._inflight),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": (lookups - self.misses) / lookups if lookups else None,
+        }
@@ -0,0 +1,164 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from executors import BACKENDS, BACKEND_THREAD
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before a stage could start"""
+
+    def __init__(self, stage: str, overdue: float):
+        super().__init__(f"Deadline exceeded by {overdue:.3f}s before stage {stage}")
+        self.stage = stage
+        self.overdue = overdue
+
+
+class Stage:
+    """One pipeline step.
+
+    ``inputs`` names what the stage receives as positional arguments: either a
+    key of the request input (e.g. "text") or the name of an upstream stage,
+    whose output is passed in. Upstream stages become dependencies.
+    """
+
+    def __init__(self, name: str, func: Callable, async_func: Optional[Callable] = None,
+                 inputs: Sequence[str] = ("text",), backend: str = BACKEND_THREAD,
+                 max_concurrency: Optional[int] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r} for stage {name}")
+        self.name = name
+        self.func = func
+        self.async_func = async_func
+        self.inputs = tuple(inputs)
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.depends_on = ()
+        # Limits how many requests run this stage at once, across all workers
+        self._limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def __aenter__(self):
+        if self._limit is not None:
+            await self._limit.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._limit is not None:
+            self._limit.release()
+
+    def describe(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "depends_on": list(self.depends_on),
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+class PipelineDAG:
+    """Runs stages as soon as their dependencies finish, so independent stages overlap"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            stage.depends_on = tuple(n for n in stage.inputs if n in self.stages)
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[Stage]:
+        order = []
+        state = {}  # name -> "visiting" | "done"
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline has a cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.stages[name].depends_on:
+                visit(dep, path + [name])
+            state[name] = "done"
+            order.append(self.stages[name])
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    async def run(self, inputs: Dict[str, Any], runner: Callable, deadline: Optional[float] = None,
+                  checkpoint: Optional[Dict[str, tuple]] = None) -> Dict[str, tuple]:
+        """Run every stage once for one request.
+
+        ``runner(stage, *args)`` executes a stage on its backend and returns
+        (value, thread_id, elapsed). Returns {stage name: that tuple}.
+        ``deadline`` (time.monotonic()) is checked before each stage starts;
+        once it has passed, DeadlineExceeded is raised and no further stage runs.
+        ``checkpoint`` collects each finished stage's tuple; passing the same dict
+        to a retry resumes at the stage that failed instead of starting over.
+        When a stage fails, siblings already running are left to finish (a
+        thread or process stage can't be stopped anyway) so their outputs are
+        checkpointed; only stages that haven't started are cancelled.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        started = set()
+
+        async def run_one(stage: Stage):
+            if checkpoint is not None and stage.name in checkpoint:
+                return checkpoint[stage.name]
+            if stage.depends_on:
+                await asyncio.gather(*(tasks[d] for d in stage.depends_on))
+            args = [tasks[n].result()[0] if n in tasks else inputs[n] for n in stage.inputs]
+            async with stage:
+                # Cooperative cancellation: a stage that already started runs to completion
+                if deadline is not None:
+                    overdue = time.monotonic() - deadline
+                    if overdue >= 0:
+                        raise DeadlineExceeded(stage.name, overdue)
+                started.add(stage.name)
+                outcome = await runner(stage, *args)
+            if checkpoint is not None:
+                checkpoint[stage.name] = outcome
+            return outcome
+
+        # Topological order guarantees a stage's dependencies already have tasks
+        for stage in self.order:
+            tasks[stage.name] = asyncio.create_task(run_one(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            for name, task in tasks.items():
+                if name not in started:
+                    task.cancel()
+            try:
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+            except asyncio.CancelledError:
+                for task in tasks.values():
+                    task.cancel()
+                raise
+            raise
+        except BaseException:
+            # Cancelled from outside (e.g. the shutdown drain deadline): stop everything
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+
+    def width(self, backend: Optional[str] = None) -> int:
+        """Most stages (on ``backend``, if given) one request can have running at once.
+
+        Stages are grouped by depth (longest dependency chain above them); the
+        widest group is the answer.
+        """
+        depth: Dict[str, int] = {}
+        widths: Dict[int, int] = {}
+        for stage in self.order:
+            depth[stage.name] = max((depth[d] + 1 for d in stage.depends_on), default=0)
+            if backend is None or stage.backend == backend:
+                widths[depth[stage.name]] = widths.get(depth[stage.name], 0) + 1
+        return max(widths.values(), default=0)
+
+    def describe(self) -> Dict:
+        return {stage.name: stage.describe() for stage in self.order}
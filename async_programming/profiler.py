@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+# Leaf frames of a thread that is parked waiting for work rather than running
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),  # Condition / Event waits, including the EventLog writer between flushes
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),  # concurrent.futures worker blocked in work_queue.get()
+    ("elastic_pool.py", "_run"),  # ElasticThreadPool worker blocked in its SimpleQueue
+    ("tracker.py", "_collect"),  # RequestTracker writer blocked in its SimpleQueue
+}
+_THREAD_SUFFIX = re.compile(r"_\d+$")
+
+
+def thread_prefix(name: str) -> str:
+    """'Worker-2_317' -> 'Worker-2'; pool threads share their pool's prefix"""
+    return _THREAD_SUFFIX.sub("", name)
+
+
+class ProfileBusy(Exception):
+    """Another profile is already running"""
+
+
+class SamplingProfiler:
+    """On-demand wall-clock stack sampler over every thread.
+
+    ``run(seconds)`` samples ``sys._current_frames()`` every ``interval``
+    seconds from the calling thread and folds the stacks into collapsed
+    form (``thread;file:func;file:func count``), ready for flamegraph.pl or
+    speedscope. Nothing is installed between runs, so it costs nothing
+    while no profile is being taken. One run at a time.
+
+    Threads parked in a queue / lock / selector wait count as idle; their
+    stacks are kept out of the collapsed output unless ``include_idle``.
+    """
+
+    def __init__(self, interval: float = 0.01, max_seconds: float = 60.0):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._labels: Dict = {}
+
+        # Statistics
+        self.runs = 0
+        self.last_run_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+        return label
+
+    def run(self, seconds: float, include_idle: bool = False, interval: Optional[float] = None) -> Dict:
+        """Sample for ``seconds`` (blocking); raises ProfileBusy if a run is in progress"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfileBusy("A profile is already running")
+        try:
+            return self._sample(min(seconds, self.max_seconds), include_idle, interval or self.interval)
+        finally:
+            self._labels.clear()
+            self._lock.release()
+
+    def _sample(self, seconds: float, include_idle: bool, interval: float) -> Dict:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        threads: Dict[str, Dict] = {}
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        next_tick = started
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                name = names.get(ident, f"thread-{ident}")
+                prefix = thread_prefix(name)
+                leaf = frame.f_code
+                idle = (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LEAVES
+                totals = threads.get(prefix)
+                if totals is None:
+                    totals = threads[prefix] = {"samples": 0, "busy": 0, "idle": 0, "threads": set()}
+                totals["samples"] += 1
+                totals["idle" if idle else "busy"] += 1
+                totals["threads"].add(ident)
+                if idle and not include_idle:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                frames.append(prefix)
+                stacks[";".join(reversed(frames))] += 1
+            samples += 1
+            # Fixed-rate ticks; a slow sample skips ahead instead of bursting to catch up
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()
+        elapsed = time.perf_counter() - started
+
+        self.runs += 1
+        self.last_run_at = time.time()
+        return {
+            "seconds": elapsed,
+            "interval": interval,
+            "samples": samples,
+            "include_idle": include_idle,
+            "threads": {
+                prefix: {
+                    "threads": len(totals.pop("threads")),
+                    **totals,
+                    "busy_ratio": totals["busy"] / totals["samples"],
+                }
+                for prefix, totals in sorted(threads.items(), key=lambda item: -item[1]["busy"])
+            },
+            "stacks": stacks,
+        }
+
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's folded format, one 'frame;frame;frame count' line per stack"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,206 @@
+"""Queue history in long format, so it works for any number of workers.
+
+* ``queue_metrics``: one row per snapshot (timestamp, total_queued,
+  active_threads, processed_requests).
+* ``queue_depths``: one row per worker per snapshot (timestamp, worker_id,
+  depth).
+
+Databases from before the split have ``worker_0_queue``..``worker_3_queue``
+columns on ``queue_metrics``; ``create_schema`` copies them into
+``queue_depths`` once and drops them.
+
+``QueueSampler`` fills both tables on a fixed interval, independent of
+who reads /queue-status.
+"""
+import asyncio
+import re
+import sqlite3
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+_LEGACY_COLUMN = re.compile(r"worker_(\d+)_queue")
+
+
+def create_schema(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS queue_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TIMESTAMP,
+            total_queued INTEGER,
+            active_threads INTEGER,
+            processed_requests INTEGER
+        )
+    ''')
+    # Range reads and retention go through this index
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_queue_metrics_timestamp ON queue_metrics(timestamp)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS queue_depths (
+            timestamp TIMESTAMP,
+            worker_id INTEGER,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (timestamp, worker_id)
+        ) WITHOUT ROWID
+    ''')
+    _migrate_legacy_columns(cursor)
+
+
+def _migrate_legacy_columns(cursor: sqlite3.Cursor):
+    legacy = []
+    for row in cursor.execute('PRAGMA table_info(queue_metrics)').fetchall():
+        match = _LEGACY_COLUMN.fullmatch(row[1])
+        if match:
+            legacy.append((row[1], int(match.group(1))))
+    for column, worker_id in legacy:
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO queue_depths (timestamp, worker_id, depth)
+            SELECT timestamp, ?, {column} FROM queue_metrics WHERE {column} IS NOT NULL
+        ''', (worker_id,))
+    for column, _ in legacy:
+        try:
+            cursor.execute(f'ALTER TABLE queue_metrics DROP COLUMN {column}')
+        except sqlite3.OperationalError:
+            # SQLite < 3.35: the nullable column stays behind, unused
+            pass
+
+
+def snapshot_rows(timestamp: str, depths: List[int]) -> List[tuple]:
+    """queue_depths rows for one snapshot"""
+    return [(timestamp, worker_id, depth) for worker_id, depth in enumerate(depths)]
+
+
+def recent(conn: sqlite3.Connection, since: Optional[str] = None, until: Optional[str] = None,
+           limit: int = 10) -> List[Dict]:
+    """Newest snapshots (optionally within [since, until]) with their per-worker depths"""
+    if since is not None or until is not None:
+        where, params = "WHERE timestamp >= ? AND timestamp <= ?", (since or "0", (until or "9999") + "\uffff")
+    else:
+        where, params = "", ()
+    snapshots = [
+        {"timestamp": timestamp, "total_queued": total, "worker_queue_sizes": [],
+         "active_threads": threads, "processed_requests": processed}
+        for timestamp, total, threads, processed in conn.execute(f'''
+            SELECT timestamp, total_queued, active_threads, processed_requests FROM queue_metrics
+            {where} ORDER BY timestamp DESC LIMIT ?
+        ''', params + (limit,))
+    ]
+    if snapshots:
+        by_timestamp = {snapshot["timestamp"]: snapshot for snapshot in snapshots}
+        for timestamp, _, depth in conn.execute('''
+            SELECT timestamp, worker_id, depth FROM queue_depths
+            WHERE timestamp >= ? AND timestamp <= ? ORDER BY timestamp, worker_id
+        ''', (snapshots[-1]["timestamp"], snapshots[0]["timestamp"])):
+            snapshot = by_timestamp.get(timestamp)
+            if snapshot is not None:
+                snapshot["worker_queue_sizes"].append(depth)
+    return snapshots
+
+
+class QueueSampler:
+    """Samples queue depths, active threads and throughput every ``interval`` seconds.
+
+    Snapshots go into an in-memory ring of ``capacity`` entries (the last
+    hour at the defaults) and are handed to ``record(row, depths)`` in one
+    batch every ``flush_interval`` seconds, so SQLite sees a steady trickle
+    whether or not anybody is watching. ``read()`` must return
+    ``(depths, active_threads, processed)``; it runs on the event loop.
+    """
+
+    def __init__(self, read: Callable[[], Tuple[List[int], int, int]], record: Callable[[Tuple, List[int]], None],
+                 interval: float = 1.0, capacity: int = 3600, flush_interval: float = 10.0):
+        self.read = read
+        self.record = record
+        self.interval = interval
+        self.flush_interval = flush_interval
+        # (monotonic, timestamp, depths, active_threads, processed, throughput)
+        self._ring: Deque[tuple] = deque(maxlen=capacity)
+        self._pending: List[tuple] = []
+        self._last_flush = time.monotonic()
+
+        # Counters
+        self.samples = 0
+        self.flushed = 0
+
+    def sample(self) -> tuple:
+        depths, active_threads, processed = self.read()
+        now = time.monotonic()
+        throughput = None
+        if self._ring:
+            previous_at, _, _, _, previous_processed, _ = self._ring[-1]
+            if now > previous_at:
+                throughput = (processed - previous_processed) / (now - previous_at)
+        snapshot = (now, datetime.now().isoformat(), tuple(depths), active_threads, processed, throughput)
+        self._ring.append(snapshot)
+        self._pending.append(snapshot)
+        self.samples += 1
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+        return snapshot
+
+    def flush(self):
+        """Hand every unflushed snapshot to the writer (one group commit)"""
+        pending, self._pending = self._pending, []
+        self._last_flush = time.monotonic()
+        for _, timestamp, depths, active_threads, processed, _ in pending:
+            self.record((timestamp, sum(depths), active_threads, processed), list(depths))
+        self.flushed += len(pending)
+
+    async def run(self):
+        # Fixed-rate ticks, independent of how long each sample takes
+        next_tick = time.monotonic()
+        try:
+            while True:
+                self.sample()
+                next_tick += self.interval
+                await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+        finally:
+            self.flush()
+
+    def history(self, seconds: Optional[float] = None, step: Optional[float] = None) -> List[Dict]:
+        """Snapshots from the last ``seconds``, averaged into ``step``-second buckets"""
+        if not self._ring:
+            return []
+        newest = self._ring[-1][0]
+        start = newest - seconds if seconds is not None else self._ring[0][0]
+        step = max(step or self.interval, self.interval)
+        buckets: Dict[int, list] = {}
+        for at, timestamp, depths, active_threads, _, throughput in self._ring:
+            if at < start:
+                continue
+            bucket = buckets.get(int((at - start) // step))
+            if bucket is None:
+                bucket = buckets[int((at - start) // step)] = [timestamp, 0, [0] * len(depths), 0, 0, 0.0, 0, 0]
+            total = sum(depths)
+            bucket[1] += 1
+            if len(depths) == len(bucket[2]):
+                bucket[2] = [a + b for a, b in zip(bucket[2], depths)]
+            bucket[3] += total
+            bucket[4] = max(bucket[4], total)
+            if throughput is not None:
+                bucket[5] += throughput
+                bucket[6] += 1
+            bucket[7] += active_threads
+        return [
+            {
+                "timestamp": timestamp,
+                "samples": n,
+                "total_queued": total / n,
+                "max_total_queued": peak,
+                "worker_queue_sizes": [depth / n for depth in depths],
+                "active_threads": threads / n,
+                "throughput_per_second": throughput / rated if rated else None,
+            }
+            for timestamp, n, depths, total, peak, throughput, rated, threads in
+            (buckets[key] for key in sorted(buckets))
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "interval": self.interval,
+            "capacity": self._ring.maxlen,
+            "buffered": len(self._ring),
+            "samples": self.samples,
+            "flushed": self.flushed,
+            "unflushed": len(self._pending),
+        }
@@ -0,0 +1,149 @@
+import random
+import time
+from typing import Dict, Optional
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """A stage's circuit breaker is open: fail fast instead of calling it"""
+
+    def __init__(self, stage: str, retry_in: float):
+        super().__init__(f"Circuit open for stage {stage}; next probe in {retry_in:.1f}s")
+        self.stage = stage
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: sleep uniform(0, min(cap, base * multiplier^attempt))"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 5.0, multiplier: float = 2.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number ``attempt + 1`` (attempt counts from 0)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** attempt))
+
+    def describe(self) -> Dict:
+        return {
+            "max_attempts": self.max_attempts,
+            "base_delay": self.base_delay,
+            "max_delay": self.max_delay,
+            "multiplier": self.multiplier,
+        }
+
+
+class RetryBudget:
+    """Global cap on retries: at most ``ratio`` retries per request, plus a small floor.
+
+    Each request deposits ``ratio`` tokens and each retry withdraws one, so
+    when everything fails at once the extra load stays near ``ratio`` instead
+    of multiplying by the attempt count. ``min_per_second`` tokens trickle in
+    regardless so low traffic can still retry.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 10.0, max_tokens: float = 1000.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._updated_at = time.monotonic()
+
+        # Counters
+        self.retries_allowed = 0
+        self.retries_rejected = 0
+
+    def _refill(self, amount: float):
+        now = time.monotonic()
+        amount += (now - self._updated_at) * self.min_per_second
+        self._updated_at = now
+        self.tokens = min(self.max_tokens, self.tokens + amount)
+
+    def record_request(self):
+        self._refill(self.ratio)
+
+    def try_acquire(self) -> bool:
+        self._refill(0.0)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.retries_allowed += 1
+            return True
+        self.retries_rejected += 1
+        return False
+
+    def stats(self) -> Dict:
+        return {
+            "ratio": self.ratio,
+            "min_per_second": self.min_per_second,
+            "tokens": round(self.tokens, 2),
+            "retries_allowed": self.retries_allowed,
+            "retries_rejected": self.retries_rejected,
+        }
+
+
+class CircuitBreaker:
+    """Per-stage breaker: opens after ``failure_threshold`` consecutive failures.
+
+    While open every call fails fast with CircuitOpenError. After
+    ``reset_timeout`` seconds one probe call is let through (half-open); its
+    success closes the breaker, its failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+        # Counters
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless the call may go ahead; True if it is the half-open probe"""
+        if self.state == BREAKER_CLOSED:
+            return False
+        now = time.monotonic()
+        if self.state == BREAKER_OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = BREAKER_HALF_OPEN
+        if self.state == BREAKER_HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(self.name, max(0.0, self.opened_at + self.reset_timeout - now))
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probing = False
+        self.state = BREAKER_CLOSED
+
+    def release_probe(self):
+        """The probe was cancelled before it said anything: let the next call probe instead"""
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != BREAKER_OPEN:
+                self.times_opened += 1
+            self.state = BREAKER_OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
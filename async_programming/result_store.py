@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class ResultStore:
+    """Bounded in-memory result cache with LRU eviction and a TTL.
+
+    Only the event loop touches it, so there is no locking. Anything that
+    falls out of the store is still available from the SQLite requests table.
+    """
+
+    def __init__(self, capacity: int = 100000, ttl_seconds: float = 3600):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+        # Counters
+        self.total_stored = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def put(self, request_id: str, result: Dict):
+        now = time.monotonic()
+        if request_id in self._entries:
+            self._entries.move_to_end(request_id)
+        self._entries[request_id] = (now, result)
+        self.total_stored += 1
+        self._expire_front(now)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, request_id: str) -> Optional[Dict]:
+        entry = self._entries.get(request_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, result = entry
+        if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[request_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(request_id)
+        self.hits += 1
+        return result
+
+    def _expire_front(self, now: float):
+        """Drop expired entries from the cold end of the LRU order"""
+        if self.ttl_seconds is None:
+            return
+        while self._entries:
+            request_id, (stored_at, _) = next(iter(self._entries.items()))
+            if now - stored_at <= self.ttl_seconds:
+                break
+            del self._entries[request_id]
+            self.expirations += 1
+
+    def __contains__(self, request_id: str) -> bool:
+        return self.get(request_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "ttl_seconds": self.ttl_seconds,
+            "total_stored": self.total_stored,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
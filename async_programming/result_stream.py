@@ -0,0 +1,133 @@
+import asyncio
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class Subscriber:
+    """One streaming client: a bounded buffer of results plus what it listens to.
+
+    Only touched from the event loop thread, so no locking. When the client
+    reads slower than results arrive, the oldest buffered results are dropped
+    (and counted) instead of growing without bound.
+    """
+
+    def __init__(self, request_ids: Optional[Iterable[str]], client_key: Optional[str], buffer_size: int):
+        self.request_ids: Optional[Set[str]] = set(request_ids) if request_ids is not None else None
+        self.client_key = client_key
+        self.buffer_size = buffer_size
+        self.remaining: Optional[Set[str]] = set(self.request_ids) if self.request_ids is not None else None
+        self._buffer = deque()
+        self._ready = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, result: Dict):
+        if len(self._buffer) >= self.buffer_size:
+            self._buffer.popleft()
+            self.dropped += 1
+        self._buffer.append(result)
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> List[Dict]:
+        """Everything buffered so far, waiting up to ``timeout`` for the first result"""
+        if not self._buffer:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        batch = list(self._buffer)
+        self._buffer.clear()
+        self.delivered += len(batch)
+        if self.remaining is not None:
+            for result in batch:
+                self.remaining.discard(result.get("request_id"))
+        return batch
+
+    @property
+    def finished(self) -> bool:
+        """An id-list subscription is finished once every id was delivered"""
+        return self.remaining is not None and not self.remaining and not self._buffer
+
+
+class ResultHub:
+    """Fan-out of finished results to streaming subscribers (SSE / WebSocket).
+
+    Subscribers are indexed by request id and by client key, so publishing a
+    result is two dict lookups no matter how many streams are open.
+    """
+
+    def __init__(self, buffer_size: int = 1000):
+        self.buffer_size = buffer_size
+        self._by_request: Dict[str, Set[Subscriber]] = {}
+        self._by_client: Dict[str, Set[Subscriber]] = {}
+
+        # Counters
+        self.published = 0
+        self.subscriptions = 0
+
+    def subscribe(self, request_ids: Optional[Iterable[str]] = None, client_key: Optional[str] = None) -> Subscriber:
+        """Listen to specific request ids, or (with ``request_ids=None``) to everything a client submitted"""
+        subscriber = Subscriber(request_ids, client_key, self.buffer_size)
+        if subscriber.request_ids is not None:
+            for request_id in subscriber.request_ids:
+                self._by_request.setdefault(request_id, set()).add(subscriber)
+        else:
+            self._by_client.setdefault(client_key, set()).add(subscriber)
+        self.subscriptions += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscriber.closed = True
+        if subscriber.request_ids is not None:
+            for request_id in subscriber.request_ids:
+                self._discard(self._by_request, request_id, subscriber)
+        else:
+            self._discard(self._by_client, subscriber.client_key, subscriber)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[Subscriber]], key: str, subscriber: Subscriber):
+        subscribers = index.get(key)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del index[key]
+
+    def resolve(self, subscriber: Subscriber, request_id: str, result: Dict) -> bool:
+        """Hand a subscriber a result that finished before it subscribed.
+
+        False (and nothing pushed) if the result was published to it meanwhile.
+        """
+        if subscriber not in self._by_request.get(request_id, ()):
+            return False
+        self._discard(self._by_request, request_id, subscriber)
+        subscriber.push(result)
+        return True
+
+    def publish(self, request_id: str, client_key: Optional[str], result: Dict):
+        """Called when a request finishes (completed or failed)"""
+        by_request = self._by_request.pop(request_id, None)
+        by_client = self._by_client.get(client_key) if client_key is not None else None
+        if not by_request and not by_client:
+            return
+        self.published += 1
+        for subscriber in by_request or ():
+            subscriber.push(result)
+        for subscriber in by_client or ():
+            subscriber.push(result)
+
+    def stats(self) -> Dict:
+        subscribers = set()
+        for index in (self._by_request, self._by_client):
+            for group in index.values():
+                subscribers.update(group)
+        return {
+            "open_subscribers": len(subscribers),
+            "watched_request_ids": len(self._by_request),
+            "watched_clients": len(self._by_client),
+            "buffer_size": self.buffer_size,
+            "published": self.published,
+            "subscriptions": self.subscriptions,
+            "dropped": sum(s.dropped for s in subscribers),
+        }
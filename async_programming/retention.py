@@ -0,0 +1,242 @@
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from rollups import TERMINAL_STATUSES
+
+
+def create_schema(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS request_archives (
+            day TEXT PRIMARY KEY,
+            path TEXT,
+            rows INTEGER NOT NULL,
+            by_status TEXT,
+            bytes INTEGER,
+            archived_at TIMESTAMP
+        )
+    ''')
+    # id -> (partition, gzip member) for recently archived rows, so /status can still find them;
+    # trimmed to index_days so the live database stays bounded
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_requests (
+            id TEXT PRIMARY KEY,
+            day TEXT NOT NULL,
+            status TEXT,
+            member_offset INTEGER
+        ) WITHOUT ROWID
+    ''')
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(archived_requests)')}
+    if 'member_offset' not in columns:
+        cursor.execute('ALTER TABLE archived_requests ADD COLUMN member_offset INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_archived_requests_day ON archived_requests(day)')
+
+
+class RetentionManager:
+    """Moves finished requests older than ``retention_days`` out of the live table.
+
+    Rows are partitioned by the day they were created and appended to one
+    gzip-compressed JSONL file per day (``requests-YYYY-MM-DD.jsonl.gz``),
+    then deleted in small chunks so the tracker's writer is never blocked
+    for long. The ``request_archives`` manifest records every partition, and
+    the per-minute rollups are left untouched, so /database/stats still
+    covers archived days. An ``archived_requests`` index (id -> day and the
+    offset of the gzip member holding the row) lets ``lookup()`` read one
+    chunk instead of the whole day; it only covers the last ``index_days``
+    days of archives, so it stays bounded too. Freed pages are reused by new rows (and returned
+    to the OS on databases created with auto_vacuum=INCREMENTAL).
+    """
+
+    def __init__(self, database_path: str, archive_dir: str, retention_days: int = 7,
+                 chunk_size: int = 5000, metrics_retention_days: Optional[int] = None,
+                 index_days: int = 30):
+        self.database_path = database_path
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.index_days = index_days
+        self.chunk_size = chunk_size
+        self.metrics_retention_days = metrics_retention_days if metrics_retention_days is not None else retention_days
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.runs = 0
+        self.rows_archived = 0
+        self.last_run_seconds = None
+        self.last_run_at = None
+
+    def cutoff(self, now: Optional[datetime] = None, days: Optional[int] = None) -> str:
+        """First day that stays live, as 'YYYY-MM-DD'"""
+        now = now or datetime.now()
+        return (now - timedelta(days=self.retention_days if days is None else days)).strftime("%Y-%m-%d")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # The delete trigger keeps request_status_counts in step
+        conn.execute('PRAGMA recursive_triggers=ON')
+        return conn
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict:
+        """Archive and delete everything older than the cutoff; returns {day: rows archived}"""
+        with self._lock:
+            started = time.perf_counter()
+            os.makedirs(self.archive_dir, exist_ok=True)
+            cutoff = self.cutoff(now)
+            conn = self._connect()
+            try:
+                archived = self._archive_requests(conn, cutoff)
+                metrics_cutoff = self.cutoff(now, self.metrics_retention_days)
+                with conn:
+                    conn.execute('DELETE FROM queue_metrics WHERE timestamp < ?', (metrics_cutoff,))
+                    conn.execute('DELETE FROM queue_depths WHERE timestamp < ?', (metrics_cutoff,))
+                    conn.execute('DELETE FROM archived_requests WHERE day < ?',
+                                 (self.cutoff(now, self.retention_days + self.index_days),))
+                conn.execute('PRAGMA incremental_vacuum')
+            finally:
+                conn.close()
+            self.runs += 1
+            self.rows_archived += sum(archived.values())
+            self.last_run_seconds = time.perf_counter() - started
+            self.last_run_at = datetime.now().isoformat()
+            return archived
+
+    def _archive_requests(self, conn: sqlite3.Connection, cutoff: str) -> Dict[str, int]:
+        archived: Dict[str, int] = {}
+        last_rowid = 0
+        while True:
+            # rowid order is insertion order, so the scan can stop at the first live day
+            rows = conn.execute(
+                'SELECT rowid, * FROM requests WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (last_rowid, self.chunk_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_rowid = rows[-1]["rowid"]
+            partitions: Dict[str, list] = {}
+            reached_live = False
+            for row in rows:
+                created_at = row["created_at"]
+                if created_at is None:
+                    continue
+                if created_at[:10] >= cutoff:
+                    reached_live = True
+                    break
+                if row["status"] in TERMINAL_STATUSES:
+                    partitions.setdefault(created_at[:10], []).append(row)
+
+            if partitions:
+                manifest = []
+                offsets: Dict[str, int] = {}
+                for day, day_rows in partitions.items():
+                    path, size, offsets[day] = self._append(day, day_rows)
+                    counts: Dict[str, int] = {}
+                    for row in day_rows:
+                        counts[row["status"]] = counts.get(row["status"], 0) + 1
+                    manifest.append((day, path, len(day_rows), counts, size))
+                    archived[day] = archived.get(day, 0) + len(day_rows)
+                # Archive first, delete second: a crash in between duplicates rows instead of losing them
+                with conn:
+                    conn.executemany('DELETE FROM requests WHERE rowid = ?',
+                                     [(row["rowid"],) for day_rows in partitions.values() for row in day_rows])
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO archived_requests (id, day, status, member_offset) VALUES (?, ?, ?, ?)',
+                        [(row["id"], day, row["status"], offsets[day])
+                         for day, day_rows in partitions.items() for row in day_rows]
+                    )
+                    for day, path, count, counts, size in manifest:
+                        self._record_partition(conn, day, path, count, counts, size)
+            if reached_live:
+                break
+        return archived
+
+    def _append(self, day: str, rows: list):
+        path = os.path.join(self.archive_dir, f"requests-{day}.jsonl.gz")
+        lines = "".join(json.dumps({key: row[key] for key in row.keys() if key != "rowid"}) + "\n" for row in rows)
+        offset = os.path.getsize(path) if os.path.exists(path) else 0
+        # Appending adds a gzip member; readers see one continuous JSONL stream, and
+        # a lookup can start decompressing at the member's offset
+        with gzip.open(path, "at", encoding="utf-8") as archive:
+            archive.write(lines)
+        return path, os.path.getsize(path), offset
+
+    def _record_partition(self, conn: sqlite3.Connection, day: str, path: str, count: int,
+                          counts: Dict[str, int], size: int):
+        existing = conn.execute('SELECT by_status FROM request_archives WHERE day = ?', (day,)).fetchone()
+        if existing is not None:
+            for status, n in json.loads(existing[0]).items():
+                counts[status] = counts.get(status, 0) + n
+        conn.execute('''
+            INSERT INTO request_archives (day, path, rows, by_status, bytes, archived_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                rows = rows + excluded.rows,
+                by_status = excluded.by_status,
+                bytes = excluded.bytes,
+                archived_at = excluded.archived_at
+        ''', (day, path, count, json.dumps(counts), size, datetime.now().isoformat()))
+
+    def lookup(self, request_id: str) -> Optional[Dict]:
+        """The archived row for a request id, or None if it is not in the index.
+
+        Decompression starts at the gzip member the row was appended in, so a
+        lookup reads one archive chunk rather than the whole day. If the archive
+        file is gone, the indexed status is all that is left.
+        """
+        conn = sqlite3.connect(self.database_path)
+        try:
+            stub = conn.execute('''
+                SELECT archived_requests.day, archived_requests.status, archived_requests.member_offset,
+                       request_archives.path
+                FROM archived_requests LEFT JOIN request_archives USING (day)
+                WHERE archived_requests.id = ?
+            ''', (request_id,)).fetchone()
+        finally:
+            conn.close()
+        if stub is None:
+            return None
+        day, status, offset, path = stub
+        if path and os.path.exists(path):
+            with open(path, "rb") as raw:
+                raw.seek(offset or 0)
+                archive = io.TextIOWrapper(gzip.GzipFile(fileobj=raw), encoding="utf-8")
+                for line in archive:
+                    # Cheap substring test before paying for json.loads
+                    if request_id in line:
+                        row = json.loads(line)
+                        if row.get("id") == request_id:
+                            return row
+        return {"id": request_id, "status": status, "archived_day": day}
+
+    def summary(self, since: Optional[str] = None, until: Optional[str] = None) -> Dict:
+        """Archived partitions overlapping [since, until] (minute keys or days)"""
+        conn = sqlite3.connect(self.database_path)
+        try:
+            rows = conn.execute('''
+                SELECT day, path, rows, by_status, bytes FROM request_archives
+                WHERE day >= ? AND day <= ? ORDER BY day
+            ''', ((since or "0")[:10], (until or "9999")[:10])).fetchall()
+        finally:
+            conn.close()
+        by_status: Dict[str, int] = {}
+        for _, _, _, counts, _ in rows:
+            for status, n in json.loads(counts).items():
+                by_status[status] = by_status.get(status, 0) + n
+        return {
+            "retention_days": self.retention_days,
+            "archive_dir": self.archive_dir,
+            "partitions": [
+                {"day": day, "path": path, "rows": count, "bytes": size}
+                for day, path, count, _, size in rows
+            ],
+            "archived_rows": sum(row[2] for row in rows),
+            "archived_by_status": by_status,
+            "archived_bytes": sum(row[4] or 0 for row in rows),
+            "last_run_at": self.last_run_at,
+            "last_run_seconds": self.last_run_seconds,
+        }
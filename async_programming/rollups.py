@@ -0,0 +1,214 @@
+"""Incrementally maintained rollups behind /database/stats.
+
+* ``request_status_counts``: current number of requests per status, kept
+  exact by triggers on ``requests`` (insert, status change, delete).
+* ``request_rollups`` / ``request_rollup_buckets``: per-minute counts of
+  finished requests by status, processing-time sum/min/max and a
+  log-bucketed processing-time histogram. The tracker's writer thread adds
+  to them in the same transaction as the status updates. The pseudo-minute
+  ``"all"`` holds all-time totals, so unfiltered stats read a few rows.
+"""
+import bisect
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import queue_metrics
+from metrics import log_buckets
+
+TERMINAL_STATUSES = ('completed', 'failed', 'expired')
+ROLLUP_ALL = "all"  # Sorts after every ISO minute, so range filters never include it
+ROLLUP_BUCKETS = log_buckets(start=0.001, factor=2 ** 0.5, count=48)  # 1ms .. ~3.3 hours
+MINUTE_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+def minute_of(timestamp: Optional[str]) -> Optional[str]:
+    """'2024-05-01T12:34:56.789' -> '2024-05-01T12:34'"""
+    return timestamp[:16] if timestamp else None
+
+
+def parse_minute(value: str) -> str:
+    """Normalize a user-supplied ISO date/time to the rollup minute key; raises ValueError"""
+    return datetime.fromisoformat(value).strftime(MINUTE_FORMAT)
+
+
+def create_schema(cursor: sqlite3.Cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS request_status_counts (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS request_rollups (
+            minute TEXT,
+            status TEXT,
+            count INTEGER NOT NULL,
+            time_count INTEGER NOT NULL,
+            time_sum REAL NOT NULL,
+            time_min REAL,
+            time_max REAL,
+            PRIMARY KEY (minute, status)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS request_rollup_buckets (
+            minute TEXT,
+            bucket INTEGER,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (minute, bucket)
+        ) WITHOUT ROWID
+    ''')
+
+    # Status counts follow every row change (REPLACE fires the delete trigger
+    # on connections with recursive_triggers enabled, as the tracker's is)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS requests_count_insert AFTER INSERT ON requests BEGIN
+            INSERT INTO request_status_counts (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT(status) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS requests_count_update AFTER UPDATE OF status ON requests
+        WHEN OLD.status IS NOT NEW.status BEGIN
+            UPDATE request_status_counts SET count = count - 1 WHERE status = OLD.status;
+            INSERT INTO request_status_counts (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT(status) DO UPDATE SET count = count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS requests_count_delete AFTER DELETE ON requests BEGIN
+            UPDATE request_status_counts SET count = count - 1 WHERE status = OLD.status;
+        END
+    ''')
+
+
+def backfill(conn: sqlite3.Connection):
+    """One-time build of the rollups for a database created before they existed"""
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        if conn.execute('SELECT 1 FROM request_status_counts LIMIT 1').fetchone() is None:
+            conn.execute('''
+                INSERT INTO request_status_counts (status, count)
+                SELECT status, COUNT(*) FROM requests GROUP BY status
+            ''')
+        if conn.execute('SELECT 1 FROM request_rollups LIMIT 1').fetchone() is None:
+            batch = RollupBatch()
+            cursor = conn.execute(
+                f"SELECT status, completed_at, processing_time FROM requests WHERE status IN {TERMINAL_STATUSES}"
+            )
+            for status, completed_at, processing_time in cursor:
+                batch.add(minute_of(completed_at), status, processing_time)
+            batch.write(conn)
+
+
+class RollupBatch:
+    """Aggregates finished requests in memory, then upserts them in one go"""
+
+    def __init__(self):
+        self.rows: Dict[tuple, List] = {}
+        self.buckets: Dict[tuple, int] = {}
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def add(self, minute: Optional[str], status: str, processing_time: Optional[float]):
+        for key in ((minute, status), (ROLLUP_ALL, status)):
+            if key[0] is None:
+                continue
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = [0, 0, 0.0, None, None]
+            row[0] += 1
+            if processing_time is not None:
+                row[1] += 1
+                row[2] += processing_time
+                row[3] = processing_time if row[3] is None else min(row[3], processing_time)
+                row[4] = processing_time if row[4] is None else max(row[4], processing_time)
+                bucket_key = (key[0], bisect.bisect_left(ROLLUP_BUCKETS, processing_time))
+                self.buckets[bucket_key] = self.buckets.get(bucket_key, 0) + 1
+
+    def write(self, conn: sqlite3.Connection):
+        conn.executemany('''
+            INSERT INTO request_rollups (minute, status, count, time_count, time_sum, time_min, time_max)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(minute, status) DO UPDATE SET
+                count = count + excluded.count,
+                time_count = time_count + excluded.time_count,
+                time_sum = time_sum + excluded.time_sum,
+                time_min = CASE WHEN time_min IS NULL OR excluded.time_min < time_min THEN excluded.time_min ELSE time_min END,
+                time_max = CASE WHEN time_max IS NULL OR excluded.time_max > time_max THEN excluded.time_max ELSE time_max END
+        ''', [key + tuple(row) for key, row in self.rows.items()])
+        conn.executemany('''
+            INSERT INTO request_rollup_buckets (minute, bucket, count) VALUES (?, ?, ?)
+            ON CONFLICT(minute, bucket) DO UPDATE SET count = count + excluded.count
+        ''', [key + (count,) for key, count in self.buckets.items()])
+
+
+def _quantile(counts: Dict[int, int], total: int, q: float, low: float, high: float) -> Optional[float]:
+    """Interpolate a quantile inside its histogram bucket, clamped to the observed min/max"""
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bucket in sorted(counts):
+        count = counts[bucket]
+        if seen + count >= rank:
+            lower = max(ROLLUP_BUCKETS[bucket - 1] if bucket > 0 else 0.0, low)
+            upper = min(ROLLUP_BUCKETS[bucket] if bucket < len(ROLLUP_BUCKETS) else high, high)
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return high
+
+
+def query_stats(conn: sqlite3.Connection, since: Optional[str] = None, until: Optional[str] = None) -> Dict:
+    """Stats from the rollups; cost depends on the minutes in range, not on the number of requests"""
+    ranged = since is not None or until is not None
+    if ranged:
+        where, params = "minute >= ? AND minute <= ?", (since or "0", until or "9999")
+    else:
+        where, params = "minute = ?", (ROLLUP_ALL,)
+
+    status_counts = dict(conn.execute('SELECT status, count FROM request_status_counts WHERE count != 0').fetchall())
+    finished = {}
+    times = None
+    for status, count, time_count, time_sum, time_min, time_max in conn.execute(f'''
+        SELECT status, SUM(count), SUM(time_count), SUM(time_sum), MIN(time_min), MAX(time_max)
+        FROM request_rollups WHERE {where} GROUP BY status
+    ''', params):
+        finished[status] = count
+        if status == 'completed':
+            times = (time_count, time_sum, time_min, time_max)
+    buckets = dict(conn.execute(f'''
+        SELECT bucket, SUM(count) FROM request_rollup_buckets WHERE {where} GROUP BY bucket
+    ''', params).fetchall())
+
+    time_count, time_sum, time_min, time_max = times or (0, 0.0, None, None)
+    stats = {
+        "request_status_counts": status_counts,
+        "finished_by_status": finished,
+        "processing_time_stats": {
+            "average_time": time_sum / time_count if time_count else None,
+            "min_time": time_min,
+            "max_time": time_max,
+            "p50_time": _quantile(buckets, time_count, 0.50, time_min or 0.0, time_max or 0.0),
+            "p95_time": _quantile(buckets, time_count, 0.95, time_min or 0.0, time_max or 0.0),
+            "p99_time": _quantile(buckets, time_count, 0.99, time_min or 0.0, time_max or 0.0),
+            "total_completed": finished.get('completed', 0),
+        },
+    }
+
+    if ranged:
+        per_minute = {}
+        for minute, status, count, time_count, time_sum in conn.execute(f'''
+            SELECT minute, status, count, time_count, time_sum FROM request_rollups
+            WHERE {where} ORDER BY minute
+        ''', params):
+            entry = per_minute.setdefault(minute, {"minute": minute})
+            entry[status] = count
+            if status == 'completed' and time_count:
+                entry["average_time"] = time_sum / time_count
+        stats["per_minute"] = list(per_minute.values())
+    # Served by idx_queue_metrics_timestamp instead of sorting the table
+    stats["recent_queue_metrics"] = queue_metrics.recent(conn, since, until)
+    return stats
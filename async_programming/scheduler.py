@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import itertools
+from typing import Dict, List, Optional
+
+ROUTING_HASH = "hash"
+ROUTING_LEAST_LOADED = "least_loaded"
+
+
+def stable_hash(key: str) -> int:
+    """64-bit hash that, unlike hash(str), is the same in every process and run"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach): going from N to N+1 buckets moves
+    only 1/(N+1) of the keys, all of them to the new bucket"""
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class WorkerScheduler:
+    """Event-driven dispatcher over the per-worker queues.
+
+    Workers await ``get()`` instead of polling. When a worker's own queue is
+    empty it steals from the longest sibling queue whose owner is busy (not
+    parked in, or just woken from, ``get()``), and a put wakes either the
+    owning worker or, if that worker is busy, any idle sibling.
+    """
+
+    def __init__(self, queues: List[asyncio.Queue], routing: str = ROUTING_HASH):
+        if routing not in (ROUTING_HASH, ROUTING_LEAST_LOADED):
+            raise ValueError(f"Unknown routing strategy: {routing}")
+        self.queues = queues
+        self.routing = routing
+        self.num_workers = len(queues)
+        self._waiters: List[Optional[asyncio.Future]] = [None] * self.num_workers
+        self._round_robin = itertools.count()
+        self._closed = False
+        self._drain = True
+
+        # Observability
+        self.routed_counts = [0] * self.num_workers
+        self.dispatch_counts = [0] * self.num_workers
+        self.steal_counts = [0] * self.num_workers
+        self.stolen_from_counts = [0] * self.num_workers
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def route(self, request_id: str) -> int:
+        """Pick the worker queue for a new request"""
+        if self.routing == ROUTING_LEAST_LOADED:
+            # Rotate the starting point so ties don't always land on worker 0
+            start = next(self._round_robin) % self.num_workers
+            order = [(start + i) % self.num_workers for i in range(self.num_workers)]
+            return min(order, key=lambda i: self.queues[i].qsize())
+        return jump_hash(stable_hash(request_id), self.num_workers)
+
+    async def put(self, data: Dict, worker_id: int):
+        await self.queues[worker_id].put(data)
+        self.routed_counts[worker_id] += 1
+        self.notify(worker_id)
+
+    def put_many(self, assignments: List[tuple]):
+        """Enqueue (data, worker_id) pairs without yielding, then wake every idle worker once"""
+        for data, worker_id in assignments:
+            self.queues[worker_id].put_nowait(data)
+            self.routed_counts[worker_id] += 1
+        for i in range(self.num_workers):
+            self._wake(i)
+
+    def notify(self, worker_id: int):
+        """Wake the owner of the queue, or any idle worker that can steal the item"""
+        if self._wake(worker_id):
+            return
+        for i in range(self.num_workers):
+            if self._wake(i):
+                return
+
+    def _wake(self, worker_id: int) -> bool:
+        waiter = self._waiters[worker_id]
+        if waiter is not None and not waiter.done():
+            # The waiter stays registered until the worker runs, so nobody steals its work meanwhile
+            waiter.set_result(None)
+            return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    async def get(self, worker_id: int) -> Optional[Dict]:
+        """Wait for the next item for this worker; returns None once closed and drained"""
+        while True:
+            if self._closed and not self._drain:
+                return None
+            data = self._take(worker_id)
+            if data is not None:
+                return data
+            if self._closed:
+                return None
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[worker_id] = waiter
+            try:
+                await waiter
+            finally:
+                if self._waiters[worker_id] is waiter:
+                    self._waiters[worker_id] = None
+
+    def _take(self, worker_id: int) -> Optional[Dict]:
+        own = self.queues[worker_id]
+        if not own.empty():
+            self.dispatch_counts[worker_id] += 1
+            return own.get_nowait()
+
+        # Only steal from owners that can't take the work themselves right now
+        busy = [i for i in range(self.num_workers) if i != worker_id and self._waiters[i] is None]
+        if not busy:
+            return None
+        victim = max(busy, key=lambda i: self.queues[i].qsize())
+        if not self.queues[victim].empty():
+            self.dispatch_counts[worker_id] += 1
+            self.steal_counts[worker_id] += 1
+            self.stolen_from_counts[victim] += 1
+            return self.queues[victim].get_nowait()
+        return None
+
+    def close(self, drain: bool = True):
+        """Stop handing out work and wake every idle worker.
+
+        With ``drain`` workers still empty the queues first; without it they
+        stop right away and whatever is queued stays in the queues.
+        """
+        self._closed = True
+        self._drain = drain
+        for i in range(self.num_workers):
+            self._wake(i)
+
+    # ------------------------------------------------------------------
+    # Stats
+    # ------------------------------------------------------------------
+    def stats(self) -> Dict:
+        return {
+            "routing": self.routing,
+            "queue_depths": [q.qsize() for q in self.queues],
+            "routed_counts": list(self.routed_counts),
+            "dispatch_counts": list(self.dispatch_counts),
+            "steal_counts": list(self.steal_counts),
+            "stolen_from_counts": list(self.stolen_from_counts),
+            "total_steals": sum(self.steal_counts),
+            "idle_workers": sum(1 for w in self._waiters if w is not None and not w.done()),
+        }
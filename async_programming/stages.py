@@ -0,0 +1,71 @@
+"""Pipeline stage functions.
+
+They live in their own module (not app.py) so a process pool can pickle them
+by reference without re-importing the whole FastAPI app in every child.
+"""
+import asyncio
+import threading
+import time
+
+STEP1_SECONDS = 2
+STEP2_SECONDS = 1
+STEP3_SECONDS = 0.5
+
+# Iterations for the CPU-bound variants (~tens of ms each on a modern core)
+STEP1_CPU_ITERATIONS = 2_000_000
+STEP2_CPU_ITERATIONS = 1_000_000
+
+
+# Blocking I/O variants (thread / process backends)
+def fun_1(v, seconds=STEP1_SECONDS):
+    time.sleep(seconds)  # Simulates a blocking operation
+    return "fun_1"
+
+def fun_2(v, seconds=STEP2_SECONDS):
+    time.sleep(seconds)  # Simulates another blocking operation
+    return "fun_2"
+
+def fun_3(text, result1, result2, seconds=STEP3_SECONDS):
+    time.sleep(seconds)  # Simulate additional processing
+    return f"processed_{text}_{result1}_{result2}"
+
+
+# Native coroutine variants (asyncio backend)
+async def fun_1_async(v, seconds=STEP1_SECONDS):
+    await asyncio.sleep(seconds)
+    return "fun_1"
+
+async def fun_2_async(v, seconds=STEP2_SECONDS):
+    await asyncio.sleep(seconds)
+    return "fun_2"
+
+async def fun_3_async(text, result1, result2, seconds=STEP3_SECONDS):
+    await asyncio.sleep(seconds)
+    return f"processed_{text}_{result1}_{result2}"
+
+
+# CPU-bound variants (what real pipeline steps look like; serialize on the GIL in threads)
+def _burn(iterations):
+    total = 0
+    for i in range(iterations):
+        total += i * i
+    return total
+
+def fun_1_cpu(v, iterations=STEP1_CPU_ITERATIONS):
+    _burn(iterations)
+    return "fun_1"
+
+def fun_2_cpu(v, iterations=STEP2_CPU_ITERATIONS):
+    _burn(iterations)
+    return "fun_2"
+
+
+def call_stage(func, *args):
+    """Run a stage and report (value, thread_id, elapsed) back to the event loop"""
+    start = time.perf_counter()
+    value = func(*args)
+    return value, threading.get_ident(), time.perf_counter() - start
+
+def warm_up():
+    """No-op task used to force process-pool workers to start (and import this module)"""
+    return threading.get_ident()
@@ -0,0 +1,143 @@
+import heapq
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Instants have no duration; Chrome's trace viewer draws them as markers
+INSTANT = None
+
+
+class Trace:
+    """Timestamped spans of one request, in time.monotonic() seconds"""
+
+    __slots__ = ("request_id", "started_at", "wall_time", "spans", "finished_at", "attrs")
+
+    def __init__(self, request_id: str, started_at: float, attrs: Dict):
+        self.request_id = request_id
+        self.started_at = started_at
+        self.wall_time = datetime.now().isoformat()
+        # (name, start, end or INSTANT, args or None); list.append is atomic, so the
+        # tracker's writer thread may add its span without a lock
+        self.spans: List[tuple] = []
+        self.finished_at: Optional[float] = None
+        self.attrs = attrs
+
+    def span(self, name: str, start: float, end: float, **args):
+        self.spans.append((name, start, end, args or None))
+
+    def instant(self, name: str, at: Optional[float] = None, **args):
+        self.spans.append((name, time.monotonic() if at is None else at, INSTANT, args or None))
+
+    def finish(self, status: str, at: Optional[float] = None, **args):
+        self.finished_at = time.monotonic() if at is None else at
+        self.attrs["status"] = status
+        self.instant("done", self.finished_at, status=status, **args)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.finished_at is None else self.finished_at - self.started_at
+
+    def breakdown(self) -> Dict[str, float]:
+        """Seconds per span name, e.g. where a slow request spent its time"""
+        totals: Dict[str, float] = {}
+        for name, start, end, _ in self.spans:
+            if end is not INSTANT:
+                totals[name] = totals.get(name, 0.0) + (end - start)
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            "request_id": self.request_id,
+            "started_at": self.wall_time,
+            "duration_seconds": self.duration,
+            **self.attrs,
+            "breakdown": self.breakdown(),
+            "spans": [
+                {
+                    "name": name,
+                    "offset_seconds": start - self.started_at,
+                    "duration_seconds": None if end is INSTANT else end - start,
+                    **(args or {}),
+                }
+                for name, start, end, args in sorted(self.spans, key=lambda span: span[1])
+            ],
+        }
+
+
+class Tracer:
+    """Per-request lifecycle tracing into a fixed-size ring buffer.
+
+    ``start()`` claims the next slot of a preallocated ring of ``capacity``
+    traces, overwriting the oldest one, so memory stays bounded and
+    recording a span is one tuple append. ``sample_rate`` traces only a
+    fraction of requests; unsampled requests get ``None`` and callers skip
+    every span with a single ``if``.
+
+    Only the event loop calls ``start()``, so there is no locking.
+    """
+
+    def __init__(self, capacity: int = 10000, sample_rate: float = 1.0):
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._ring: List[Optional[Trace]] = [None] * capacity
+        self._index: Dict[str, int] = {}
+        self._next = 0
+
+        # Counters
+        self.started = 0
+        self.overwritten = 0
+
+    def start(self, request_id: str, at: Optional[float] = None, **attrs) -> Optional[Trace]:
+        if not self.capacity or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return None
+        trace = Trace(request_id, time.monotonic() if at is None else at, attrs)
+        trace.instant("received", trace.started_at)
+        slot = self._next
+        self._next = (slot + 1) % self.capacity
+        old = self._ring[slot]
+        if old is not None:
+            self.overwritten += 1
+            if self._index.get(old.request_id) == slot:
+                del self._index[old.request_id]
+        self._ring[slot] = trace
+        self._index[request_id] = slot
+        self.started += 1
+        return trace
+
+    def get(self, request_id: str) -> Optional[Trace]:
+        slot = self._index.get(request_id)
+        return None if slot is None else self._ring[slot]
+
+    def slowest(self, limit: int = 20) -> List[Trace]:
+        """Finished traces still in the ring, longest first"""
+        finished = (trace for trace in self._ring if trace is not None and trace.finished_at is not None)
+        return heapq.nlargest(limit, finished, key=lambda trace: trace.duration)
+
+    def stats(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "sample_rate": self.sample_rate,
+            "traces": len(self._index),
+            "started": self.started,
+            "overwritten": self.overwritten,
+        }
+
+
+def chrome_trace(traces: Iterable[Trace]) -> Dict:
+    """Chrome trace-event JSON (chrome://tracing, Perfetto): one row per request"""
+    traces = list(traces)
+    origin = min((trace.started_at for trace in traces), default=0.0)
+    events = []
+    for tid, trace in enumerate(traces, start=1):
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                       "args": {"name": trace.request_id}})
+        for name, start, end, args in trace.spans:
+            event = {"name": name, "cat": "request", "pid": 1, "tid": tid,
+                     "ts": round((start - origin) * 1e6, 3), "args": dict(args or {}, request_id=trace.request_id)}
+            if end is INSTANT:
+                event.update(ph="i", s="t")
+            else:
+                event.update(ph="X", dur=round((end - start) * 1e6, 3))
+            events.append(event)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -0,0 +1,337 @@
+import queue
+import sqlite3
+import threading
+import time
+import atexit
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from queue_metrics import snapshot_rows
+from rollups import RollupBatch, TERMINAL_STATUSES, minute_of, query_stats
+
+# Columns that update_request_status() is allowed to touch
+REQUEST_UPDATE_COLUMNS = (
+    'started_at',
+    'completed_at',
+    'processing_time',
+    'step1_result',
+    'step2_result',
+    'final_result',
+    'thread_id',
+    'error_message',
+)
+
+_INSERT = 'insert'
+_INSERT_MANY = 'insert_many'
+_UPDATE = 'update'
+_METRICS = 'metrics'
+_MEMO = 'memo'
+_FLUSH = 'flush'
+_NOTIFY = 'notify'
+_STOP = 'stop'
+
+
+class RequestTracker:
+    """Write-behind SQLite tracker.
+
+    API handlers only append records to an in-memory queue. A single writer
+    thread owns one long-lived WAL connection, coalesces the records and
+    writes them with executemany() in one group commit per batch.
+    """
+
+    def __init__(self, database_path: str, batch_size: int = 1000, flush_interval: float = 0.05,
+                 on_flush: Optional[Callable[[float, int], None]] = None):
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Called from the writer thread with (seconds, records) after each commit
+        self.on_flush = on_flush
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._readers = threading.local()
+
+        # Writer statistics
+        self.batches_committed = 0
+        self.records_written = 0
+        self.last_flush_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        """Start the writer thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name="RequestTracker-Writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until every record enqueued so far has been committed"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, lambda ok: done.set()))
+        return done.wait(timeout)
+
+    def when_committed(self, callback: Callable[[bool], None]):
+        """Call ``callback(ok)`` from the writer thread once every record enqueued
+        so far is committed. Unlike flush() it does not cut the batch short, so
+        many callers still share one group commit."""
+        self._queue.put((_NOTIFY, callback))
+
+    def close(self):
+        """Flush pending records, stop the writer and close the connection"""
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._closed:
+                return
+            self._closed = True
+        self._queue.put((_STOP, None))
+        thread.join()
+        with self._lock:
+            self._thread = None
+
+    def pending(self) -> int:
+        """Approximate number of records waiting to be written"""
+        return self._queue.qsize()
+
+    # ------------------------------------------------------------------
+    # Producer API (never touches disk)
+    # ------------------------------------------------------------------
+    def record_queued(self, request_id: str, text: str, worker_id: int, created_at: str, queued_at: str,
+                      deadline_at: Optional[float] = None, priority: Optional[int] = None,
+                      tenant: Optional[str] = None, client: Optional[str] = None):
+        """``deadline_at`` is wall-clock (time.time()), so it still means something after a restart"""
+        self._queue.put((_INSERT, (request_id, text, worker_id, 'queued', created_at, queued_at,
+                                   deadline_at, priority, tenant, client)))
+
+    def record_queued_many(self, rows: List[Tuple]):
+        """Enqueue many (id, text, worker_id, created_at, queued_at, deadline_at, priority,
+        tenant, client) rows as one record"""
+        self._queue.put((_INSERT_MANY, [
+            (request_id, text, worker_id, 'queued', created_at, queued_at) + tuple(extra)
+            for request_id, text, worker_id, created_at, queued_at, *extra in rows
+        ]))
+
+    def record_status(self, request_id: str, status: str, **fields):
+        for column in fields:
+            if column not in REQUEST_UPDATE_COLUMNS:
+                raise ValueError(f"Unknown request column: {column}")
+        fields['status'] = status
+        self._queue.put((_UPDATE, (request_id, fields)))
+
+    def record_metrics(self, row: Tuple, depths: List[int]):
+        """Enqueue a queue_metrics row (timestamp, total_queued, active_threads, processed)
+        and the per-worker queue depths of the same snapshot"""
+        self._queue.put((_METRICS, (row, depths)))
+
+    def record_memo(self, key: str, version: str, outputs: str, created_at: str):
+        """Enqueue a memo_cache row; ``outputs`` is the JSON of the stage values"""
+        self._queue.put((_MEMO, (key, version, outputs, created_at)))
+
+    # ------------------------------------------------------------------
+    # Read path (call from an executor thread, never from the event loop)
+    # ------------------------------------------------------------------
+    def _reader(self) -> sqlite3.Connection:
+        """One read connection per thread; WAL lets it run alongside the writer"""
+        conn = getattr(self._readers, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.database_path)
+            conn.row_factory = sqlite3.Row
+            self._readers.conn = conn
+        return conn
+
+    def fetch_request(self, request_id: str) -> Optional[Dict]:
+        """Return the stored row for a request id, or None if it was never recorded"""
+        row = self._reader().execute('SELECT * FROM requests WHERE id = ?', (request_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def fetch_memo(self, key: str) -> Optional[str]:
+        """Return the JSON outputs stored for a memo key, or None"""
+        row = self._reader().execute('SELECT outputs FROM memo_cache WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def fetch_stats(self, since: Optional[str] = None, until: Optional[str] = None) -> Dict:
+        """/database/stats from the rollup tables (minute keys, inclusive)"""
+        return query_stats(self._reader(), since, until)
+
+    def iter_unfinished(self, chunk_size: int = 10000):
+        """Yield lists of (id, text, worker_id, deadline_at, priority, tenant, client) for
+        requests left 'queued' or 'processing' by a previous run, in insertion (rowid) order"""
+        conn = sqlite3.connect(self.database_path)
+        try:
+            cursor = conn.execute('''
+                SELECT id, text, worker_id, deadline_at, priority, tenant, client FROM requests
+                WHERE status IN ('queued', 'processing')
+                ORDER BY rowid
+            ''')
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # INSERT OR REPLACE must fire the delete trigger that keeps request_status_counts exact
+        conn.execute('PRAGMA recursive_triggers=ON')
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            running = True
+            while running:
+                batch, waiters, running = self._collect()
+                ok = self._write_batch(conn, batch) if batch else True
+                for callback in waiters:
+                    try:
+                        callback(ok)
+                    except Exception as e:
+                        print(f"❌ Request tracker commit callback failed: {e}")
+        finally:
+            conn.close()
+
+    def _collect(self):
+        """Gather records until the batch is full or the flush interval elapses"""
+        batch = []
+        waiters = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            kind, payload = item
+            if kind == _STOP:
+                # Drain whatever is left so nothing enqueued before close() is lost
+                while True:
+                    try:
+                        kind, payload = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if kind in (_FLUSH, _NOTIFY):
+                        waiters.append(payload)
+                    elif kind != _STOP:
+                        batch.append((kind, payload))
+                return batch, waiters, False
+            if kind == _FLUSH:
+                waiters.append(payload)
+                return batch, waiters, True
+            if kind == _NOTIFY:
+                waiters.append(payload)
+            else:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, waiters, True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return batch, waiters, True
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, waiters, True
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Tuple]) -> bool:
+        started = time.perf_counter()
+        try:
+            self._write_records(conn, batch)
+            self.batches_committed += 1
+            self.records_written += len(batch)
+            return True
+        except Exception as e:
+            print(f"❌ Database error flushing batch of {len(batch)} records: {e}; retrying one record at a time")
+            return self._write_one_by_one(conn, batch)
+        finally:
+            self.last_flush_seconds = time.perf_counter() - started
+            if self.on_flush is not None:
+                self.on_flush(self.last_flush_seconds, len(batch))
+
+    def _write_one_by_one(self, conn: sqlite3.Connection, batch: List[Tuple]) -> bool:
+        """Fallback after a failed group commit: one bad row must not drop everybody else's"""
+        failed = 0
+        for kind, payload in batch:
+            records = [(_INSERT, row) for row in payload] if kind == _INSERT_MANY else [(kind, payload)]
+            for record in records:
+                try:
+                    self._write_records(conn, [record])
+                    self.records_written += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Database error, dropping {record[0]} record: {e}")
+        self.batches_committed += 1
+        return failed == 0
+
+    def _write_records(self, conn: sqlite3.Connection, batch: List[Tuple]):
+        """Write records in one transaction; raises (and rolls back) on any error"""
+        inserts = []
+        metrics = []
+        depths = []
+        memos = []
+        # Coalesce status transitions: later fields win, one UPDATE per request id
+        updates: Dict[str, Dict] = {}
+        for kind, payload in batch:
+            if kind == _INSERT:
+                inserts.append(payload)
+            elif kind == _INSERT_MANY:
+                inserts.extend(payload)
+            elif kind == _UPDATE:
+                request_id, fields = payload
+                updates.setdefault(request_id, {}).update(fields)
+            elif kind == _METRICS:
+                row, worker_depths = payload
+                metrics.append(row)
+                depths.extend(snapshot_rows(row[0], worker_depths))
+            elif kind == _MEMO:
+                memos.append(payload)
+
+        # Group coalesced updates by column set so each group is one executemany()
+        grouped: Dict[Tuple[str, ...], List[Tuple]] = {}
+        rollups = RollupBatch()
+        now_minute = None
+        for request_id, fields in updates.items():
+            columns = tuple(sorted(fields))
+            grouped.setdefault(columns, []).append(tuple(fields[c] for c in columns) + (request_id,))
+            # Finished requests feed the per-minute rollups in the same transaction
+            status = fields['status']
+            if status in TERMINAL_STATUSES:
+                minute = minute_of(fields.get('completed_at'))
+                if minute is None:
+                    now_minute = now_minute or minute_of(datetime.now().isoformat())
+                    minute = now_minute
+                rollups.add(minute, status, fields.get('processing_time') if status == 'completed' else None)
+
+        with conn:
+            if inserts:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO requests
+                    (id, text, worker_id, status, created_at, queued_at, deadline_at, priority, tenant, client)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', inserts)
+            for columns, rows in grouped.items():
+                assignments = ', '.join(f"{c} = ?" for c in columns)
+                conn.executemany(f"UPDATE requests SET {assignments} WHERE id = ?", rows)
+            if metrics:
+                conn.executemany('''
+                    INSERT INTO queue_metrics (timestamp, total_queued, active_threads, processed_requests)
+                    VALUES (?, ?, ?, ?)
+                ''', metrics)
+                conn.executemany('''
+                    INSERT OR REPLACE INTO queue_depths (timestamp, worker_id, depth) VALUES (?, ?, ?)
+                ''', depths)
+            if rollups:
+                rollups.write(conn)
+            if memos:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO memo_cache (key, version, outputs, created_at)
+                    VALUES (?, ?, ?, ?)
+                ''', memos)